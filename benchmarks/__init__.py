@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарки приложений напоминалки и генератора паролей
+"""
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Запуск набора бенчмарков с сохранением результатов в JSON
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --output new.json --compare results.json
+    python -m benchmarks --only monitor_tick,vault_lookup --reminders 50000
+"""
+
+import argparse
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.scenarios import SCENARIOS, BenchmarkConfig
+
+# Метрики, у которых «больше» означает «лучше»
+HIGHER_IS_BETTER_SUFFIX = '_per_sec'
+
+
+def run_benchmarks(config, names):
+    """Выполнить выбранные сценарии, каждый в своем временном каталоге"""
+    results = {}
+    for name in names:
+        print(f"Сценарий {name}...", flush=True)
+        with tempfile.TemporaryDirectory() as workdir:
+            results[name] = SCENARIOS[name](workdir, config)
+    return results
+
+
+def compare(old, new):
+    """Напечатать изменение числовых метрик относительно прошлого запуска"""
+    print(f"\n{'Метрика':<50} {'было':>12} {'стало':>12} {'изменение':>10}")
+    for scenario, metrics in new['results'].items():
+        old_metrics = old.get('results', {}).get(scenario, {})
+        for metric, value in metrics.items():
+            previous = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)) or not previous:
+                continue
+            change = (value - previous) / previous * 100
+            better = change > 0 if metric.endswith(HIGHER_IS_BETTER_SUFFIX) else change < 0
+            mark = ' ' if abs(change) < 5 else '+' if better else '-'
+            print(f"{scenario + '.' + metric:<50} {previous:>12.2f} {value:>12.2f} {change:>+9.1f}% {mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки напоминалки и менеджера паролей")
+    parser.add_argument('--reminders', type=int, default=10000, help="количество напоминаний")
+    parser.add_argument('--vault', type=int, default=10000, help="количество записей хранилища")
+    parser.add_argument('--operations', type=int, default=20000, help="операций в замерах пропускной способности")
+    parser.add_argument('--repeats', type=int, default=5, help="повторов каждого замера времени")
+    parser.add_argument('--seed', type=int, default=42, help="seed синтетических данных")
+    parser.add_argument('--only', help="список сценариев через запятую")
+    parser.add_argument('--output', help="файл для результатов в формате JSON")
+    parser.add_argument('--compare', help="JSON с результатами прошлого запуска")
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}; доступны: {', '.join(SCENARIOS)}")
+
+    config = BenchmarkConfig(args.reminders, args.vault, args.operations, args.repeats, args.seed)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'config': config.to_dict(),
+        },
+        'results': run_benchmarks(config, names),
+    }
+
+    print(json.dumps(report['results'], indent=2, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
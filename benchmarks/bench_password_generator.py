@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Сравнение генератора паролей на os.urandom с прежней реализацией на random.choice
+
+Запуск: python -m benchmarks.bench_password_generator [количество]
+"""
+
+import random
+import string
+import sys
+import time
+
+from password_engine import PasswordEngine, PasswordPolicy
+
+
+def legacy_generate(length=16, use_uppercase=True, use_lowercase=True, use_digits=True, use_special=True, exclude_similar=False):
+    """Прежняя реализация PasswordGenerator.generate (посимвольный random.choice)"""
+    character_pool = ""
+    if use_uppercase:
+        character_pool += string.ascii_uppercase
+    if use_lowercase:
+        character_pool += string.ascii_lowercase
+    if use_digits:
+        character_pool += string.digits
+    if use_special:
+        character_pool += string.punctuation
+
+    if exclude_similar:
+        similar_chars = ['0', 'O', 'l', 'I']
+        for _ in range(100):
+            password = ''.join(random.choice(character_pool) for _ in range(length))
+            has_similar = False
+            for char in similar_chars:
+                if char in password:
+                    for other_char in similar_chars:
+                        if other_char != char and other_char in password:
+                            has_similar = True
+                            break
+                    if has_similar:
+                        break
+            if not has_similar:
+                return password
+    return ''.join(random.choice(character_pool) for _ in range(length))
+
+
+def measure(func, count):
+    """Вернуть число паролей в секунду"""
+    start = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed else float('inf')
+
+
+def run(count=200000):
+    """Выполнить сравнение и вернуть результаты"""
+    engine = PasswordEngine()
+    results = {}
+
+    for exclude_similar in (False, True):
+        policy = PasswordPolicy(length=16, exclude_similar=exclude_similar)
+        legacy_count = max(1, count // 10)
+        results[f"legacy exclude_similar={exclude_similar}"] = measure(
+            lambda n: [legacy_generate(16, exclude_similar=exclude_similar) for _ in range(n)], legacy_count)
+        results[f"generate exclude_similar={exclude_similar}"] = measure(
+            lambda n: [engine.generate(policy) for _ in range(n)], legacy_count)
+        results[f"generate_many exclude_similar={exclude_similar}"] = measure(
+            lambda n: engine.generate_many(n, policy), count)
+
+    no_classes = PasswordPolicy(length=16, require_each_class=False)
+    results["generate_many без обязательных классов"] = measure(
+        lambda n: engine.generate_many(n, no_classes), count * 5)
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for name, rate in run(count).items():
+        print(f"{name:<45} {rate:>14,.0f} паролей/с")
+
+
+if __name__ == "__main__":
+    main()
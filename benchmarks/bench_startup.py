@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка времени запуска против бюджета
+
+Каждый сценарий выполняется в отдельном процессе; из времени вычитается запуск
+пустого интерпретатора. Код возврата 1, если медиана превысила бюджет или
+сценарий загрузил модули, которых при запуске быть не должно.
+
+Запуск: python -m benchmarks.bench_startup [повторы]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджеты в миллисекундах сверх запуска пустого интерпретатора
+SCENARIOS = {
+    "password_manager: список паролей": {
+        "budget_ms": 150,
+        "code": (
+            "import password_manager\n"
+            "manager = password_manager.PasswordManager()\n"
+            "manager.db_manager.list_passwords()\n"
+        ),
+        "forbidden": ("cryptography", "vault_io", "vault_audit", "vault_search", "tkinter"),
+    },
+    "main: импорт без запуска GUI": {
+        "budget_ms": 50,
+        "code": "import main\n",
+        "forbidden": ("tkinter", "gui", "notifications"),
+    },
+    "напоминалка: база и менеджер уведомлений": {
+        "budget_ms": 100,
+        "code": (
+            "from database import ReminderDatabase\n"
+            "from notifications import NotificationManager\n"
+            "NotificationManager(ReminderDatabase())\n"
+        ),
+        "forbidden": ("tkinter",),
+    },
+}
+
+
+def run_once(code, workdir):
+    """Время выполнения кода в новом процессе (секунды)"""
+    # Кэш байткода разрешен: меряется обычный запуск, а не компиляция исходников
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def loaded_modules(code, workdir, names):
+    """Какие из перечисленных модулей оказались загружены после выполнения кода"""
+    probe = code + (
+        "import sys\n"
+        f"print(','.join(name for name in {names!r} if name in sys.modules))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    output = subprocess.run([sys.executable, '-c', probe], cwd=workdir, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return [name for name in output.strip().split(',') if name]
+
+
+def run(repeats=7):
+    """Выполнить все сценарии; вернуть список (название, медиана мс, бюджет мс, лишние модули)"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = statistics.median(run_once('pass', workdir) for _ in range(repeats))
+        for name, scenario in SCENARIOS.items():
+            # Первый прогон создает файлы баз данных и прогревает кэш байткода
+            run_once(scenario["code"], workdir)
+            timings = [run_once(scenario["code"], workdir) for _ in range(repeats)]
+            median_ms = max(0.0, statistics.median(timings) - baseline) * 1000
+            extra = loaded_modules(scenario["code"], workdir, scenario["forbidden"])
+            results.append((name, median_ms, scenario["budget_ms"], extra))
+    return results
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    failed = False
+    for name, median_ms, budget_ms, extra in run(repeats):
+        ok = median_ms <= budget_ms and not extra
+        failed = failed or not ok
+        status = "OK" if ok else "ПРЕВЫШЕН"
+        print(f"{name:<45} {median_ms:>7.1f} мс (бюджет {budget_ms} мс) {status}")
+        if extra:
+            print(f"    загружены лишние модули: {', '.join(extra)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочный тест полос приоритетов
+
+За одну минуту виртуального времени срабатывают тысячи напоминаний низкого
+приоритета, сотни обычных и несколько важных. Показ каждого уведомления
+стоит SHOW_COST виртуального времени, как создание окна. Сравниваются прежняя
+доставка (все подряд по времени срабатывания) и полосы приоритетов с
+ограничением скорости и сводками. Код возврата 1, если задержка важных
+напоминаний с полосами превысила --budget секунд.
+
+Обычная полоса (2 в секунду) держит часть напоминаний в очереди дольше минуты.
+mark_overdue не трогает забранные напоминания (claimed_by), поэтому ожидающие
+показа не становятся просроченными, а повторяющиеся не переносятся до показа;
+тест считает такие напоминания и тоже завершается с кодом 1, если они есть.
+
+Запуск: python -m benchmarks.load_priority --low 5000 --normal 500 --high 20
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+from clock import VirtualClock
+from database import PRIORITY_COLUMN, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, ReminderDatabase
+from notifications import NotificationManager
+
+# Время на показ одного уведомления (окно, системное уведомление)
+SHOW_COST = timedelta(milliseconds=50)
+
+START = datetime(2025, 1, 6, 9, 0)
+
+
+class LoadNotificationManager(NotificationManager):
+    """Вместо окна сдвигает виртуальные часы на SHOW_COST и запоминает момент показа"""
+
+    def __init__(self, database, clock):
+        super().__init__(database, clock)
+        self.popups = 0
+        self.first_shown = {}  # id -> (приоритет, задержка первого показа в секундах)
+
+    def _record(self, reminder, moment):
+        if reminder[0] not in self.first_shown:
+            due = datetime.fromisoformat(str(reminder[3]))
+            self.first_shown[reminder[0]] = (reminder[PRIORITY_COLUMN], (moment - due).total_seconds())
+
+    def _show_notification(self, reminder):
+        self.clock.advance(SHOW_COST)
+        self.popups += 1
+        if reminder[0] > 0:
+            self._record(reminder, self.clock.now())
+
+    def _notify_summary(self, reminders):
+        for reminder in reminders:
+            self._record(reminder, self.clock.now() + SHOW_COST)
+        super()._notify_summary(reminders)
+
+
+class FifoNotificationManager(LoadNotificationManager):
+    """Прежнее поведение: каждое напоминание показывается сразу, по времени срабатывания"""
+
+    def check_reminders(self):
+        due_reminders = sorted(self.database.claim_due_reminders(self.instance_id), key=lambda r: str(r[3]))
+        for reminder in due_reminders:
+            self._show_notification(reminder)
+        return due_reminders
+
+
+def populate(database, low, normal, high, seed):
+    """Все напоминания срабатывают в течение первой минуты"""
+    rng = random.Random(seed)
+    rows = []
+    for priority, count in ((PRIORITY_LOW, low), (PRIORITY_NORMAL, normal), (PRIORITY_HIGH, high)):
+        for i in range(count):
+            due = START + timedelta(seconds=rng.uniform(0, 60))
+            rows.append((f"Напоминание {priority}-{i}", "", due, priority))
+    with sqlite3.connect(database.db_name) as conn:
+        conn.executemany('INSERT INTO reminders (title, description, due_time, priority) VALUES (?, ?, ?, ?)', rows)
+        conn.commit()
+
+
+def run(manager_class, workdir, args):
+    clock = VirtualClock(START)
+    database = ReminderDatabase(os.path.join(workdir, f'{manager_class.__name__}.db'), clock=clock)
+    populate(database, args.low, args.normal, args.high, args.seed)
+    manager = manager_class(database, clock)
+
+    total = args.low + args.normal + args.high
+    end = START + timedelta(hours=2)
+    while clock.now() < end and len(manager.first_shown) < total:
+        manager.check_reminders()
+        clock.sleep(1)
+
+    with sqlite3.connect(database.db_name) as conn:
+        overdue = conn.execute("SELECT COUNT(*) FROM reminders WHERE status = 'Просрочено'").fetchone()[0]
+
+    report = {'notifications_shown': manager.popups, 'overdue_while_queued': overdue}
+    for priority, name in ((PRIORITY_HIGH, 'high'), (PRIORITY_NORMAL, 'normal'), (PRIORITY_LOW, 'low')):
+        lags = sorted(lag for p, lag in manager.first_shown.values() if p == priority)
+        report[f'{name}_delivered'] = len(lags)
+        report[f'{name}_lag_p50_s'] = statistics.median(lags) if lags else 0.0
+        report[f'{name}_lag_max_s'] = lags[-1] if lags else 0.0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест полос приоритетов")
+    parser.add_argument('--low', type=int, default=5000)
+    parser.add_argument('--normal', type=int, default=500)
+    parser.add_argument('--high', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--budget', type=float, default=2.0, help="допустимая задержка важных напоминаний (с)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {
+            'Прежняя доставка': run(FifoNotificationManager, workdir, args),
+            'Полосы приоритетов': run(LoadNotificationManager, workdir, args),
+        }
+
+    for name, report in results.items():
+        print(f"{name}:")
+        print(f"  показано уведомлений: {report['notifications_shown']}, "
+              f"просрочено в очереди: {report['overdue_while_queued']}")
+        for lane, title in (('high', 'важные'), ('normal', 'обычные'), ('low', 'низкие')):
+            print(f"  {title:<8} доставлено {report[f'{lane}_delivered']:>6}, "
+                  f"задержка p50 {report[f'{lane}_lag_p50_s']:>8.2f} с, макс. {report[f'{lane}_lag_max_s']:>8.2f} с")
+
+    high_max = results['Полосы приоритетов']['high_lag_max_s']
+    ok = high_max <= args.budget
+    print(f"Задержка важных: {high_max:.2f} с (бюджет {args.budget} с) {'OK' if ok else 'ПРЕВЫШЕН'}")
+    raise SystemExit(0 if ok and not results['Полосы приоритетов']['overdue_while_queued'] else 1)
+
+
+if __name__ == "__main__":
+    main()
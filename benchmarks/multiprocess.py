@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка нескольких процессов с одной базой reminders.db
+
+Несколько процессов одновременно опрашивают общую базу, как запущенные
+рядом экземпляры main.py. Каждое сработавшее напоминание должно быть показано
+ровно один раз; код возврата 1, если есть повторы или пропуски.
+
+С --cluster процессы работают в кластерном режиме (аренды разделов), а --kill
+аварийно завершает один узел посередине прогона: его разделы должны перейти
+к живым узлам не позже чем через аренду плюс интервал heartbeat.
+
+Запуск:
+    python -m benchmarks.multiprocess --processes 4 --reminders 500
+    python -m benchmarks.multiprocess --cluster --kill --lease-seconds 3 --seconds 20
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from database import ReminderDatabase
+from delivery import DELIVERY_LIMITS, DeliveryQueues
+from notifications import NotificationManager
+
+
+class RecordingNotificationManager(NotificationManager):
+    """Отправляет показанные напоминания в очередь вместо вывода окон"""
+
+    def __init__(self, database, results, clustered=False):
+        super().__init__(database, clustered=clustered)
+        self.results = results
+        # Проверяется захват напоминаний, а не ограничение скорости показа
+        self.delivery = DeliveryQueues(self.clock, limits={priority: (10 ** 6, 10 ** 6) for priority in DELIVERY_LIMITS})
+
+    def _show_notification(self, reminder):
+        self.results.put((self.instance_id, reminder[0], datetime.fromisoformat(str(reminder[3])), datetime.now()))
+
+
+def worker(db_name, results, seconds, poll_interval, clustered, lease_seconds):
+    """Опрашивать базу seconds секунд, отправляя показанные напоминания в очередь"""
+    manager = RecordingNotificationManager(ReminderDatabase(db_name), results, clustered)
+    if manager.leases:
+        manager.leases.lease_ttl = timedelta(seconds=lease_seconds)
+        manager.leases.heartbeat_interval = manager.leases.lease_ttl / 3
+    results.put((manager.instance_id, None, None, None))
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        manager.check_reminders()
+        time.sleep(poll_interval)
+    if manager.leases:
+        manager.leases.release_all()
+
+
+def change_detection_latency(db_name, samples=50):
+    """Время от записи одним соединением до того, как has_changed() увидит ее в другом (мс)"""
+    writer = ReminderDatabase(db_name)
+    watcher = ReminderDatabase(db_name)
+    watcher.has_changed()
+    latencies = []
+    for i in range(samples):
+        start = time.perf_counter()
+        writer.add_reminder(f"Проверка {i}", "", datetime.now() + timedelta(days=365))
+        while not watcher.has_changed():
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+    poll_start = time.perf_counter()
+    for _ in range(1000):
+        watcher.has_changed()
+    poll_us = (time.perf_counter() - poll_start) * 1000
+    return max(latencies), poll_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Несколько процессов с общей базой напоминаний")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--reminders', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=5, help="за сколько секунд срабатывают все напоминания")
+    parser.add_argument('--poll', type=float, default=0.05, help="период опроса в процессе (с)")
+    parser.add_argument('--cluster', action='store_true', help="кластерный режим с арендами разделов")
+    parser.add_argument('--lease-seconds', type=float, default=3, help="срок аренды в кластерном режиме")
+    parser.add_argument('--kill', action='store_true', help="аварийно завершить один узел посередине прогона")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_name = os.path.join(workdir, 'reminders.db')
+        database = ReminderDatabase(db_name)
+        start = datetime.now() + timedelta(seconds=1)
+        step = timedelta(seconds=args.seconds) / max(args.reminders, 1)
+        ids = [database.add_reminder(f"Напоминание {i}", "", start + step * i) for i in range(args.reminders)]
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(db_name, results, args.seconds + 2 + args.lease_seconds * 2,
+                                                         args.poll, args.cluster, args.lease_seconds))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+
+        killed_at = None
+        if args.kill:
+            time.sleep(1 + args.seconds / 2)
+            processes[0].kill()
+            killed_at = datetime.now()
+
+        nodes, fires = [], []
+        while any(process.is_alive() for process in processes) or not results.empty():
+            try:
+                node, reminder_id, due, fired = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if reminder_id is None:
+                nodes.append(node)
+            else:
+                fires.append((node, reminder_id, due, fired))
+
+        with sqlite3.connect(db_name) as conn:
+            claimed_by = dict(conn.execute('SELECT id, claimed_by FROM reminders'))
+        max_latency_ms, poll_us = change_detection_latency(db_name)
+
+    counts = Counter(reminder_id for _, reminder_id, _, _ in fires)
+    duplicates = sum(count - 1 for count in counts.values() if count > 1)
+    missing = set(ids) - set(counts)
+    # Узел мог забрать напоминание и погибнуть, не успев его показать
+    dead = {node for node in nodes if args.kill and node.startswith(f"{processes[0].pid}-")}
+    lost_in_crash = {i for i in missing if (claimed_by.get(i) or '').split('#')[0] in dead}
+    missed = len(missing - lost_in_crash)
+    per_node = Counter(node for node, _, _, _ in fires)
+    lags = [(fired - due).total_seconds() for _, _, due, fired in fires]
+
+    print(f"Процессов: {args.processes}, напоминаний: {args.reminders}, кластер: {'да' if args.cluster else 'нет'}")
+    print(f"Показано по процессам: {[per_node[node] for node in nodes]}")
+    print(f"Повторные показы: {duplicates}, пропущено: {missed}, потеряно при сбое узла: {len(lost_in_crash)}")
+    print(f"Задержка показа: макс. {max(lags, default=0):.2f} с")
+    if killed_at:
+        late = [(fired - due).total_seconds() for _, _, due, fired in fires if due >= killed_at]
+        print(f"После сбоя узла: показано {len(late)}, макс. задержка {max(late, default=0):.2f} с "
+              f"(граница: аренда {args.lease_seconds} с + heartbeat {args.lease_seconds / 3:.1f} с)")
+    print(f"Обнаружение изменений: до {max_latency_ms:.2f} мс, проверка {poll_us:.1f} мкс")
+    raise SystemExit(1 if duplicates or missed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка очереди доставки со сбоями процессов
+
+Несколько процессов показывают напоминания из общей базы, а проверка все время
+их роняет: родитель убивает случайный процесс (SIGKILL), а сами процессы
+аварийно завершаются прямо перед показом или сразу после него, до фиксации.
+Вместо упавшего запускается новый, который при старте восстанавливает брошенные
+записи очереди доставки.
+
+Каждое напоминание должно быть показано; повторный показ допустим только если
+прежний показ сделал упавший процесс (показ уже был, а запись о нем - нет).
+В конце все напоминания подтверждены, а очередь доставки пуста.
+Код возврата 1 при пропусках, необъяснимых повторах или незавершенной доставке.
+
+Запуск:
+    python -m benchmarks.outbox_crash --workers 3 --reminders 2000 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from database import ReminderDatabase
+from delivery import DELIVERY_LIMITS, DeliveryQueues
+from notifications import NotificationManager
+
+
+class CrashingNotificationManager(NotificationManager):
+    """Записывает показы в файл, сразу подтверждает их и иногда падает вокруг показа"""
+
+    def __init__(self, database, log, crash_rate, calm_at, seed):
+        super().__init__(database)
+        self.log = log
+        self.crash_rate = crash_rate
+        self.calm_at = calm_at
+        self.rng = random.Random(seed)
+        # Проверяется доставка, а не ограничение скорости показа
+        self.delivery = DeliveryQueues(self.clock, limits={priority: (10 ** 6, 10 ** 6) for priority in DELIVERY_LIMITS})
+
+    def _maybe_crash(self):
+        if time.time() < self.calm_at and self.rng.random() < self.crash_rate / 2:
+            os._exit(1)
+
+    def _show_notification(self, reminder):
+        self._maybe_crash()  # Сбой до показа
+        repeat = 1 if "(повтор" in reminder[1] else 0
+        # Метка времени нужна, чтобы восстановить общий порядок показов из файлов разных процессов
+        self.log.write(f"{time.time_ns()} {os.getpid()} {reminder[0]} {repeat}\n")
+        self.log.flush()
+        self._maybe_crash()  # Сбой после показа, до записи в базу
+        self.acknowledge(reminder[0])
+
+
+def worker(db_name, log_dir, lease_seconds, crash_rate, calm_at, deadline, poll_interval):
+    """Опрашивать базу до deadline, записывая показы в свой файл"""
+    database = ReminderDatabase(db_name)
+    database.outbox_lease = timedelta(seconds=lease_seconds)
+    with open(os.path.join(log_dir, f'{os.getpid()}.log'), 'a', encoding='utf-8') as log:
+        manager = CrashingNotificationManager(database, log, crash_rate, calm_at, os.getpid())
+        while time.time() < deadline:
+            manager.check_reminders()
+            time.sleep(poll_interval)
+        manager.stop_monitoring()
+
+
+def group_commit_speedup(db_name, count=500):
+    """Подтверждения по одной транзакции против одной транзакции на пачку (подтверждений в секунду)"""
+    database = ReminderDatabase(db_name)
+    due = datetime.now() + timedelta(days=365)
+    ids = [database.add_reminder(f"Замер {i}", "", due) for i in range(count * 2)]
+    start = time.perf_counter()
+    for reminder_id in ids[:count]:
+        database.update_status(reminder_id, "Готово")
+    single = count / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for offset in range(count, count * 2, 50):
+        database.acknowledge_deliveries(ids[offset:offset + 50])
+    grouped = count / (time.perf_counter() - start)
+    return single, grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Очередь доставки напоминаний со сбоями процессов")
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--reminders', type=int, default=2000)
+    parser.add_argument('--seconds', type=float, default=10, help="за сколько секунд срабатывают все напоминания")
+    parser.add_argument('--lease', type=float, default=2, help="срок владения записью очереди доставки (с)")
+    parser.add_argument('--kill-every', type=float, default=1.5, help="период SIGKILL случайного процесса (с)")
+    parser.add_argument('--crash-rate', type=float, default=0.002, help="вероятность сбоя процесса на показ")
+    parser.add_argument('--poll', type=float, default=0.05, help="период опроса в процессе (с)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_name = os.path.join(workdir, 'reminders.db')
+        database = ReminderDatabase(db_name)
+        start = datetime.now() + timedelta(seconds=1)
+        step = timedelta(seconds=args.seconds) / max(args.reminders, 1)
+        ids = [database.add_reminder(f"Напоминание {i}", "", start + step * i) for i in range(args.reminders)]
+
+        began = time.time()
+        calm_at = began + 1 + args.seconds  # После этого сбоев больше нет
+        deadline = calm_at + args.lease * 3 + 2
+        worker_args = (db_name, workdir, args.lease, args.crash_rate, calm_at, deadline, args.poll)
+
+        processes = [multiprocessing.Process(target=worker, args=worker_args) for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        crashed, killed = set(), 0
+        next_kill = began + args.kill_every
+        while time.time() < calm_at:
+            time.sleep(0.05)
+            if time.time() >= next_kill:
+                victim = rng.choice([process for process in processes if process.is_alive()] or processes)
+                victim.kill()
+                killed += 1
+                next_kill += args.kill_every
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    process.join()
+                    crashed.add(process.pid)
+                    # Новый процесс при старте забирает брошенные записи
+                    processes[i] = multiprocessing.Process(target=worker, args=worker_args)
+                    processes[i].start()
+        for process in processes:
+            process.join()
+            if process.exitcode:
+                crashed.add(process.pid)
+        elapsed = time.time() - began
+
+        deliveries = []
+        for name in os.listdir(workdir):
+            if name.endswith('.log'):
+                with open(os.path.join(workdir, name), encoding='utf-8') as log:
+                    deliveries.extend(tuple(int(value) for value in line.split()) for line in log if line.strip())
+        deliveries.sort()
+        with sqlite3.connect(db_name) as conn:
+            unfinished = conn.execute("SELECT COUNT(*) FROM reminders WHERE status != 'Готово'").fetchone()[0]
+            outbox = conn.execute('SELECT COUNT(*) FROM delivery_outbox').fetchone()[0]
+        single_rate, grouped_rate = group_commit_speedup(os.path.join(workdir, 'commit.db'))
+
+    shown_by = defaultdict(list)
+    for _, pid, reminder_id, repeat in deliveries:
+        if not repeat:
+            shown_by[reminder_id].append(pid)
+    missed = [reminder_id for reminder_id in ids if reminder_id not in shown_by]
+    duplicates = sum(len(pids) - 1 for pids in shown_by.values())
+    # Повтор объясним, если все прежние показы сделали упавшие процессы
+    unexplained = sum(1 for pids in shown_by.values() for i in range(1, len(pids))
+                      if any(pid not in crashed for pid in pids[:i]))
+    repeats = sum(1 for _, _, _, repeat in deliveries if repeat)
+
+    print(f"Процессов: {args.workers}, напоминаний: {args.reminders}, за {elapsed:.1f} с "
+          f"({args.reminders / args.seconds:.0f} в секунду)")
+    print(f"Сбоев процессов: {len(crashed)} (из них SIGKILL: {killed})")
+    print(f"Пропущено: {len(missed)}, повторных показов после сбоя: {duplicates} (необъяснимых: {unexplained}), "
+          f"повторов неподтвержденных: {repeats}")
+    print(f"Не подтверждено: {unfinished}, осталось в очереди доставки: {outbox}")
+    print(f"Подтверждения: по одной транзакции {single_rate:.0f}/с, пачками по 50 - {grouped_rate:.0f}/с")
+    print(f"Показов: {len(deliveries)}")
+    raise SystemExit(1 if missed or unexplained or unfinished or outbox else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка синхронизации копий базы напоминаний
+
+Несколько копий reminders.db независимо меняются (добавление, смена статуса,
+перенос, удаление, перенос выполненных повторяющихся) и синхронизируются попарно
+в случайном порядке, в том числе с конфликтующими правками одних и тех же
+напоминаний. После финального обмена все копии должны совпасть, повторная
+синхронизация не должна ничего передавать, а каждое напоминание должно остаться
+в одном экземпляре (перенос повторяющихся на каждой копии не должен их размножать).
+Код возврата 1, если копии разошлись или напоминания размножились.
+
+Запуск:
+    python -m benchmarks.reminder_sync_check --replicas 3 --rounds 200
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import SYNC_COLUMNS, ReminderDatabase
+from reminder_sync import ReminderReplica, ReminderSync
+from sync_transport import LocalTransport
+
+
+def snapshot(database):
+    """Содержимое копии: uid -> синхронизируемые поля"""
+    with sqlite3.connect(database.db_name) as conn:
+        rows = conn.execute(f"SELECT uid, {', '.join(SYNC_COLUMNS)} FROM reminders")
+        return {row[0]: tuple(str(value) for value in row[1:]) for row in rows}
+
+
+def random_edit(database, rng, counter):
+    """Одно случайное изменение копии (counter - источник уникальных названий)"""
+    with sqlite3.connect(database.db_name) as conn:
+        ids = [row[0] for row in conn.execute('SELECT id FROM reminders')]
+    action = rng.random()
+    if not ids or action < 0.35:
+        due = datetime(2025, 1, 6, 8, 0) + timedelta(minutes=rng.randrange(10000))
+        is_recurring = rng.random() < 0.3
+        database.add_reminder(f"Напоминание {next(counter)}", "", due, is_recurring, 1 if is_recurring else 0, 'days',
+                              priority=rng.randrange(3))
+    elif action < 0.7:
+        database.update_status(rng.choice(ids), rng.choice(["Ожидает", "Готово", "Просрочено"]))
+    elif action < 0.85:
+        with sqlite3.connect(database.db_name) as conn:
+            conn.execute('UPDATE reminders SET due_time = ? WHERE id = ?',
+                         (datetime(2025, 2, 1) + timedelta(minutes=rng.randrange(10000)), rng.choice(ids)))
+    else:
+        database.delete_reminder(rng.choice(ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка синхронизации копий базы напоминаний")
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--bulk', type=int, default=5000, help="напоминаний для замера полной и дельта-передачи")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        databases = [ReminderDatabase(os.path.join(workdir, f'replica{i}.db')) for i in range(args.replicas)]
+        replicas = [ReminderReplica(database) for database in databases]
+
+        def sync(left, right):
+            return ReminderSync(replicas[left], LocalTransport(replicas[right])).sync()
+
+        counter = itertools.count()
+        for _ in range(args.rounds):
+            for _ in range(rng.randrange(1, 4)):
+                random_edit(rng.choice(databases), rng, counter)
+            if rng.random() < 0.2:
+                # Обновление окна на одной из копий переносит выполненные повторяющиеся
+                rng.choice(databases).process_recurring_reminders()
+            if rng.random() < 0.3:
+                left, right = rng.sample(range(args.replicas), 2)
+                sync(left, right)
+
+        # Два прохода по кольцу доносят все изменения до всех копий
+        for _ in range(2):
+            for i in range(args.replicas):
+                sync(i, (i + 1) % args.replicas)
+        snapshots = [snapshot(database) for database in databases]
+        diverged = sum(1 for other in snapshots[1:] if other != snapshots[0])
+        counts = [len(snapshot) for snapshot in snapshots]
+        # Названия уникальны, поэтому лишние записи с тем же названием - размножившиеся напоминания
+        duplicates = max(len(snapshot) - len({row[0] for row in snapshot.values()}) for snapshot in snapshots)
+        idle = sync(0, 1)
+
+        # Полная передача и дельта между двумя новыми копиями
+        source = ReminderDatabase(os.path.join(workdir, 'bulk_source.db'))
+        target = ReminderDatabase(os.path.join(workdir, 'bulk_target.db'))
+        start = datetime(2025, 1, 6, 8, 0)
+        with sqlite3.connect(source.db_name) as conn:
+            conn.executemany('INSERT INTO reminders (title, description, due_time) VALUES (?, ?, ?)',
+                             [(f"Напоминание {i}", "", start + timedelta(minutes=i)) for i in range(args.bulk)])
+        bulk = ReminderSync(ReminderReplica(target), LocalTransport(ReminderReplica(source)))
+        began = time.perf_counter()
+        full = bulk.sync()
+        full_ms = (time.perf_counter() - began) * 1000
+        with sqlite3.connect(source.db_name) as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM reminders')]
+        for reminder_id in rng.sample(ids, max(1, args.bulk // 100)):
+            source.update_status(reminder_id, "Готово")
+        began = time.perf_counter()
+        delta = bulk.sync()
+        delta_ms = (time.perf_counter() - began) * 1000
+
+    print(f"Копий: {args.replicas}, раундов: {args.rounds}, напоминаний в копиях: {counts}")
+    print(f"Разошлось копий: {diverged}, размножившихся напоминаний: {duplicates}, "
+          f"передано при повторной синхронизации: {idle.pulled + idle.pushed}")
+    print(f"Полная передача {args.bulk}: {full.pulled} изменений, {full.bytes_transferred} байт, {full_ms:.0f} мс")
+    print(f"Дельта ({args.bulk // 100} правок): {delta.pulled} изменений, {delta.bytes_transferred} байт, {delta_ms:.0f} мс")
+    raise SystemExit(1 if diverged or duplicates or len(set(counts)) > 1 or idle.pulled or idle.pushed else 0)
+
+
+if __name__ == "__main__":
+    main()
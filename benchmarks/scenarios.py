@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+"""
+Сценарии бенчмарков напоминалки и менеджера паролей
+
+Каждый сценарий получает рабочий каталог и параметры запуска и возвращает
+словарь метрик (время в миллисекундах, пропускная способность в операциях/с).
+"""
+
+import os
+import random
+import shutil
+import statistics
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import generate_vault_entries, populate_reminders, populate_vault
+
+
+class BenchmarkConfig:
+    """Параметры запуска бенчмарков"""
+
+    def __init__(self, reminders=10000, vault=10000, operations=20000, repeats=5, seed=42):
+        self.reminders = reminders
+        self.vault = vault
+        self.operations = operations
+        self.repeats = repeats
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def timings(func, repeats):
+    """Выполнить func repeats раз; вернуть min/median/mean в миллисекундах"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': min(samples),
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.mean(samples),
+    }
+
+
+def throughput(func, operations):
+    """Выполнить func(operations) один раз; вернуть операций в секунду"""
+    start = time.perf_counter()
+    func(operations)
+    elapsed = time.perf_counter() - start
+    return operations / elapsed if elapsed else float('inf')
+
+
+def quiet_notification_manager(database):
+    """Менеджер уведомлений, который считает показы вместо вывода окон"""
+    from notifications import NotificationManager
+
+    class QuietNotificationManager(NotificationManager):
+        shown = 0
+
+        def _show_notification(self, reminder):
+            self.shown += 1
+
+    return QuietNotificationManager(database)
+
+
+def _reminder_database(workdir, config, name='reminders.db'):
+    from database import ReminderDatabase
+
+    database = ReminderDatabase(os.path.join(workdir, name))
+    populate_reminders(database, config.reminders, datetime.now(), config.seed)
+    return database
+
+
+def bench_monitor_tick(workdir, config):
+    """Одна итерация цикла мониторинга: mark_overdue + get_due_reminders + показ"""
+    database = _reminder_database(workdir, config)
+    manager = quiet_notification_manager(database)
+
+    first = timings(manager.check_reminders, 1)
+    steady = timings(manager.check_reminders, config.repeats)
+    return {
+        'first_tick_ms': first['median_ms'],
+        **{f'steady_{key}': value for key, value in steady.items()},
+        'fired': manager.shown,
+    }
+
+
+def bench_gui_refresh(workdir, config):
+    """Обновление списка в главном окне (или только работа с БД, если нет дисплея)"""
+    database = _reminder_database(workdir, config)
+
+    def data_refresh():
+        database.process_recurring_reminders()
+        return [(r[0], r[1], r[3], r[4]) for r in database.get_all_reminders()]
+
+    result = {f'data_{key}': value for key, value in timings(data_refresh, config.repeats).items()}
+
+    try:
+        import tkinter
+        from gui import ReminderApp
+    except ImportError:
+        result['tk'] = 'skipped'
+        return result
+
+    try:
+        app = ReminderApp(database, quiet_notification_manager(database))
+        app.root.withdraw()
+    except tkinter.TclError:
+        # Нет дисплея (например, на сервере CI)
+        result['tk'] = 'skipped'
+        return result
+
+    try:
+        result.update({f'tk_{key}': value for key, value in timings(app.refresh_reminders, config.repeats).items()})
+    finally:
+        app.root.destroy()
+    return result
+
+
+def bench_recurring_rollover(workdir, config):
+    """Перенос выполненных и просроченных повторяющихся напоминаний"""
+    template = _reminder_database(workdir, config, 'rollover_template.db')
+    from database import ReminderDatabase
+
+    samples = []
+    for i in range(config.repeats):
+        path = os.path.join(workdir, f'rollover_{i}.db')
+        shutil.copyfile(template.db_name, path)
+        database = ReminderDatabase(path)
+        start = time.perf_counter()
+        database.process_recurring_reminders()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'min_ms': min(samples), 'median_ms': statistics.median(samples)}
+
+
+def _vault(workdir, config):
+    from password_manager import DatabaseManager, EncryptionManager
+
+    db_manager = DatabaseManager(os.path.join(workdir, 'passwords.db'))
+    encryption_manager = EncryptionManager(os.path.join(workdir, '.key'))
+    return db_manager, encryption_manager
+
+
+def bench_vault_lookup(workdir, config):
+    """Поиск записи по точному названию и по поисковому индексу"""
+    db_manager, encryption_manager = _vault(workdir, config)
+    populate_vault(db_manager, encryption_manager, config.vault, config.seed)
+    names = [entry[0] for entry in generate_vault_entries(config.vault, config.seed)]
+    rng = random.Random(config.seed)
+    lookups = max(1, config.operations // 20)
+
+    def exact(count):
+        for _ in range(count):
+            db_manager.get_password(rng.choice(names))
+
+    from vault_search import VaultSearchIndex
+    index = VaultSearchIndex(db_manager)
+    index_ms = timings(index.refresh, 1)['median_ms']
+
+    def search(count):
+        for _ in range(count):
+            index.search(rng.choice(names).split()[0].lower() + ' ' + str(rng.randrange(config.vault)), limit=10)
+
+    return {
+        'exact_lookups_per_sec': throughput(exact, lookups),
+        'search_index_build_ms': index_ms,
+        'search_queries_per_sec': throughput(search, lookups),
+        'list_ms': timings(db_manager.list_passwords, config.repeats)['median_ms'],
+    }
+
+
+def bench_password_history(workdir, config):
+    """Смена паролей с историей: скорость обновления и чтение текущих версий после частой ротации"""
+    import sqlite3
+
+    db_manager, encryption_manager = _vault(workdir, config)
+    populate_vault(db_manager, encryption_manager, config.vault, config.seed)
+    names = [entry[0] for entry in generate_vault_entries(config.vault, config.seed)]
+    rng = random.Random(config.seed)
+    # Часть записей ротируется много раз - больше, чем хранится в истории
+    rotating = rng.sample(names, max(1, config.vault // 100))
+    encrypted = encryption_manager.encrypt("новый пароль")
+    updates = max(1, config.operations // 10)
+
+    def rotate(count):
+        for i in range(count):
+            db_manager.update_password(rotating[i % len(rotating)], encrypted)
+
+    def exact(count):
+        for _ in range(count):
+            db_manager.get_password(rng.choice(names))
+
+    update_rate = throughput(rotate, updates)
+    with sqlite3.connect(db_manager.db_name) as conn:
+        history_rows = conn.execute('SELECT COUNT(*) FROM password_history').fetchone()[0]
+    return {
+        'updates_per_sec': update_rate,
+        'history_rows': history_rows,
+        'history_bound': len(rotating) * db_manager.history_limit,
+        'exact_lookups_per_sec': throughput(exact, max(1, config.operations // 20)),
+        'history_reads_per_sec': throughput(lambda n: [db_manager.get_password_history(rng.choice(rotating))
+                                                       for _ in range(n)], max(1, config.operations // 20)),
+        'list_ms': timings(db_manager.list_passwords, config.repeats)['median_ms'],
+    }
+
+
+def bench_vault_browser(workdir, config):
+    """Открытие окна хранилища: чтение метаданных против расшифровки всех паролей"""
+    db_manager, encryption_manager = _vault(workdir, config)
+    populate_vault(db_manager, encryption_manager, config.vault, config.seed)
+
+    def decrypt_all():
+        for rows in db_manager.iter_passwords(1000):
+            for _, _, _, encrypted, _, _ in rows:
+                encryption_manager.decrypt(encrypted)
+
+    result = {
+        'metadata_ms': timings(db_manager.list_passwords, config.repeats)['median_ms'],
+        'decrypt_all_ms': timings(decrypt_all, 1)['median_ms'],
+    }
+
+    try:
+        import tkinter
+        from vault_gui import VaultBrowser
+    except ImportError:
+        result['tk'] = 'skipped'
+        return result
+
+    try:
+        browser = VaultBrowser(db_manager, encryption_manager)
+        browser.root.withdraw()
+    except tkinter.TclError:
+        # Нет дисплея (например, на сервере CI)
+        result['tk'] = 'skipped'
+        return result
+
+    try:
+        result.update({f'tk_open_{key}': value for key, value in timings(browser.load_entries, config.repeats).items()})
+        result['tk_decryptions'] = browser.decryptions
+    finally:
+        browser.root.destroy()
+    return result
+
+
+def bench_encrypt_decrypt(workdir, config):
+    """Шифрование и расшифровка отдельных паролей"""
+    _, encryption_manager = _vault(workdir, config)
+    passwords = [entry[2] for entry in generate_vault_entries(min(config.operations, 1000), config.seed)]
+    tokens = [encryption_manager.encrypt(password) for password in passwords]
+
+    def encrypt(count):
+        for i in range(count):
+            encryption_manager.encrypt(passwords[i % len(passwords)])
+
+    def decrypt(count):
+        for i in range(count):
+            encryption_manager.decrypt(tokens[i % len(tokens)])
+
+    return {
+        'encrypt_per_sec': throughput(encrypt, config.operations),
+        'decrypt_per_sec': throughput(decrypt, config.operations),
+    }
+
+
+def bench_vault_storage(workdir, config):
+    """Размер хранилища и скорость расшифровки: токены Fernet в TEXT против AES-GCM в BLOB"""
+    import sqlite3
+    from vault_io import VaultTransfer
+
+    db_manager, encryption_manager = _vault(workdir, config)
+    entries = generate_vault_entries(config.vault, config.seed)
+    fernet = encryption_manager.cipher
+    db_manager.add_passwords_bulk([(name, login, fernet.encrypt(password.encode()).decode(), '', '')
+                                   for name, login, password in entries])
+
+    def vault_size():
+        with sqlite3.connect(db_manager.db_name) as conn:
+            conn.execute('VACUUM')
+            ciphertext = conn.execute('SELECT SUM(LENGTH(CAST(password_encrypted AS BLOB))) FROM passwords').fetchone()[0]
+        return os.path.getsize(db_manager.db_name), ciphertext / len(entries)
+
+    def decrypt_all(_):
+        for rows in db_manager.iter_passwords(1000):
+            for _, _, _, encrypted, _, _ in rows:
+                encryption_manager.decrypt(encrypted)
+
+    legacy_size, legacy_entry = vault_size()
+    legacy_rate = throughput(decrypt_all, len(entries))
+    migrate_rate = throughput(lambda _: VaultTransfer(db_manager, encryption_manager).migrate_storage(), len(entries))
+    size, entry = vault_size()
+    return {
+        'legacy_file_bytes': legacy_size,
+        'legacy_ciphertext_bytes_per_entry': legacy_entry,
+        'legacy_decrypt_per_sec': legacy_rate,
+        'migrate_per_sec': migrate_rate,
+        'file_bytes': size,
+        'ciphertext_bytes_per_entry': entry,
+        'decrypt_per_sec': throughput(decrypt_all, len(entries)),
+    }
+
+
+def bench_vault_sync(workdir, config):
+    """Синхронизация двух копий: первая полная передача и дельта после изменения 1% записей"""
+    from password_manager import DatabaseManager
+    from sync_transport import LocalTransport
+    from vault_sync import VaultReplica, VaultSync
+
+    db_manager, encryption_manager = _vault(workdir, config)
+    populate_vault(db_manager, encryption_manager, config.vault, config.seed)
+    replica = DatabaseManager(os.path.join(workdir, 'replica.db'))
+
+    def sync():
+        start = time.perf_counter()
+        report = VaultSync(VaultReplica(db_manager), LocalTransport(VaultReplica(replica))).sync()
+        return report, (time.perf_counter() - start) * 1000
+
+    full, full_ms = sync()
+    rng = random.Random(config.seed)
+    names = [entry[0] for entry in generate_vault_entries(config.vault, config.seed)]
+    changes = max(1, config.vault // 100)
+    for name in rng.sample(names, changes // 2):
+        db_manager.delete_password(name)
+    for i in range(changes - changes // 2):
+        replica.add_password(f"Новая запись {i}", "user", encryption_manager.encrypt("secret"))
+    delta, delta_ms = sync()
+    return {
+        'full_ms': full_ms,
+        'full_bytes': full.bytes_transferred,
+        'delta_changes': changes,
+        'delta_ms': delta_ms,
+        'delta_hashes': delta.hashes_exchanged,
+        'delta_bytes': delta.bytes_transferred,
+    }
+
+
+def bench_password_generation(workdir, config):
+    """Генерация паролей и парольных фраз"""
+    from password_engine import MODE_PASSPHRASE, PasswordEngine, PasswordPolicy
+
+    engine = PasswordEngine()
+    policy = PasswordPolicy(length=16)
+    passphrase = PasswordPolicy(mode=MODE_PASSPHRASE, word_count=6)
+    batch = config.operations * 10
+
+    return {
+        'generate_per_sec': throughput(lambda n: [engine.generate(policy) for _ in range(n)], config.operations),
+        'generate_many_per_sec': throughput(lambda n: engine.generate_many(n, policy), batch),
+        'passphrases_per_sec': throughput(lambda n: engine.generate_many(n, passphrase), config.operations),
+    }
+
+
+def bench_timing_wheel(workdir, config):
+    """Таймеры отложенных уведомлений: добавление, отмена и срабатывание"""
+    from datetime import timedelta
+    from timing_wheel import TimingWheel
+
+    start = datetime(2025, 1, 6, 8, 0)
+    wheel = TimingWheel(start)
+    rng = random.Random(config.seed)
+    count = config.operations * 50
+    moments = [start + timedelta(seconds=rng.randrange(1, 3600)) for _ in range(count)]
+    timers = []
+
+    def schedule(n):
+        timers.extend(wheel.schedule(moments[i], i) for i in range(n))
+
+    def cancel(n):
+        for timer in timers[:n]:
+            wheel.cancel(timer)
+
+    schedule_rate = throughput(schedule, count)
+    cancel_rate = throughput(cancel, count // 2)
+    fired = []
+    advance_ms = timings(lambda: fired.extend(wheel.advance(start + timedelta(hours=1))), 1)['median_ms']
+    return {
+        'timers': count,
+        'schedule_per_sec': schedule_rate,
+        'cancel_per_sec': cancel_rate,
+        'advance_hour_ms': advance_ms,
+        'fired': len(fired),
+    }
+
+
+SCENARIOS = {
+    'monitor_tick': bench_monitor_tick,
+    'gui_refresh': bench_gui_refresh,
+    'recurring_rollover': bench_recurring_rollover,
+    'vault_lookup': bench_vault_lookup,
+    'password_history': bench_password_history,
+    'vault_browser': bench_vault_browser,
+    'encrypt_decrypt': bench_encrypt_decrypt,
+    'vault_storage': bench_vault_storage,
+    'vault_sync': bench_vault_sync,
+    'password_generation': bench_password_generation,
+    'timing_wheel': bench_timing_wheel,
+}
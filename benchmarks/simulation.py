@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Симуляция работы планировщика напоминаний в виртуальном времени
+
+Недели трафика проигрываются за секунды: монитор по-прежнему проверяет базу
+раз в секунду виртуального времени, но секунды, в которые ничего не может
+произойти, пропускаются. В конце печатается задержка срабатывания,
+пропущенные и повторные срабатывания и число обращений к базе.
+
+Запуск: python -m benchmarks.simulation --days 28 --rate 30
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic import RECURRING_CHOICES, REMINDER_TITLES
+from clock import VirtualClock
+from database import ReminderDatabase
+from notifications import NotificationManager
+
+# Время, через которое пользователь нажимает OK во всплывающем окне
+ACK_DELAY = timedelta(seconds=5)
+
+# Временная база на RAM-диске: симуляция меряет число операций, а не скорость fsync
+DEFAULT_WORKDIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Быстрые кнопки (минуты) и их доля среди новых напоминаний
+QUICK_MINUTES = ((1, 10), (5, 25), (15, 25), (30, 15))
+QUICK_SHARE = 0.5
+
+# Доля повторяющихся среди обычных (не быстрых) напоминаний
+RECURRING_SHARE = 0.05
+
+
+class CountingDatabase:
+    """Обертка над ReminderDatabase, считающая вызовы методов"""
+
+    def __init__(self, database):
+        self._database = database
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._database, name)
+        if not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class SimulatedNotificationManager(NotificationManager):
+    """Вместо окна записывает срабатывание и планирует подтверждение через ACK_DELAY"""
+
+    def __init__(self, database, clock):
+        super().__init__(database, clock)
+        self.fires = []          # (id, due_time, время срабатывания)
+        self.pending_acks = []   # куча (время подтверждения, id)
+
+    def _show_notification(self, reminder):
+        now = self.clock.now()
+        self.fires.append((reminder[0], _parse_time(reminder[3]), now))
+        heapq.heappush(self.pending_acks, (now + ACK_DELAY, reminder[0]))
+
+    def process_acks(self):
+        """Подтвердить напоминания, окно которых «закрылось»"""
+        now = self.clock.now()
+        while self.pending_acks and self.pending_acks[0][0] <= now:
+            _, reminder_id = heapq.heappop(self.pending_acks)
+            self.acknowledge(reminder_id)
+
+
+def _parse_time(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _ceil_to_tick(moment, start):
+    """Ближайший момент опроса (целое число секунд от начала) не раньше moment"""
+    seconds = (moment - start).total_seconds()
+    whole = int(seconds)
+    if whole < seconds:
+        whole += 1
+    return start + timedelta(seconds=whole)
+
+
+class Workload:
+    """Поток новых напоминаний: пуассоновский процесс с заданной интенсивностью"""
+
+    def __init__(self, start, rate_per_hour, seed):
+        self.rng = random.Random(seed)
+        self.rate = rate_per_hour / 3600
+        self.next_arrival = start + self._gap()
+        self.created = 0
+
+    def _gap(self):
+        return timedelta(seconds=self.rng.expovariate(self.rate)) if self.rate > 0 else timedelta(days=36500)
+
+    def _new_reminder(self, now):
+        rng = self.rng
+        title = f"{rng.choice(REMINDER_TITLES)} #{self.created}"
+        if rng.random() < QUICK_SHARE:
+            minutes = rng.choices([m for m, _ in QUICK_MINUTES], weights=[w for _, w in QUICK_MINUTES])[0]
+            return title, "", now + timedelta(minutes=minutes), False, 0, 'minutes'
+
+        due_time = now + timedelta(minutes=rng.expovariate(1 / 240) + 1)
+        if rng.random() < RECURRING_SHARE:
+            interval, unit, _ = rng.choices(RECURRING_CHOICES, weights=[c[-1] for c in RECURRING_CHOICES])[0]
+            return title, "", due_time, True, interval, unit
+        return title, "", due_time, False, 0, 'minutes'
+
+    def emit(self, database, now):
+        """Добавить все напоминания, «созданные» пользователем к моменту now"""
+        while self.next_arrival <= now:
+            database.add_reminder(*self._new_reminder(self.next_arrival))
+            self.created += 1
+            self.next_arrival += self._gap()
+
+
+class ReminderSimulation:
+    """Прогон монитора напоминаний на виртуальных часах"""
+
+    def __init__(self, db_name, days=7, rate_per_hour=20, refresh_every=timedelta(minutes=10), seed=1, start=None):
+        self.start = (start or datetime(2025, 1, 6, 8, 0)).replace(microsecond=0)
+        self.end = self.start + timedelta(days=days)
+        self.clock = VirtualClock(self.start)
+        self.database = CountingDatabase(ReminderDatabase(db_name, clock=self.clock))
+        self.manager = SimulatedNotificationManager(self.database, self.clock)
+        self.workload = Workload(self.start, rate_per_hour, seed)
+        self.refresh_every = refresh_every
+        self.ticks = 0
+
+    def _next_event(self, now):
+        """Ближайший момент, когда опрос может что-то изменить"""
+        # Очереди доставки разбираются на каждой проверке: пока они не пусты, ничего не пропускаем
+        if len(self.manager.delivery):
+            return now + timedelta(seconds=1)
+
+        candidates = [self.workload.next_arrival, now + self.refresh_every]
+        if self.manager.pending_acks:
+            candidates.append(self.manager.pending_acks[0][0])
+        # Повторы и отложенные показы живут в колесе таймеров, а не в базе
+        timer = self.manager.timers.next_expiry()
+        if timer is not None:
+            candidates.append(timer)
+
+        with sqlite3.connect(self.database.db_name) as conn:
+            row = conn.execute('''
+                SELECT MIN(due_time) FROM reminders WHERE status = 'Ожидает' AND due_time > ?
+            ''', (now,)).fetchone()
+        if row and row[0]:
+            candidates.append(_parse_time(row[0]))
+        return min(candidates)
+
+    def run(self):
+        """Выполнить симуляцию и вернуть отчет"""
+        wall_start = time.perf_counter()
+        next_refresh = self.start
+        now = self.start
+
+        while now < self.end:
+            self.workload.emit(self.database, now)
+            self.manager.process_acks()
+            if now >= next_refresh:
+                # Обновление списка в окне переносит повторяющиеся напоминания
+                self.database.process_recurring_reminders()
+                next_refresh = now + self.refresh_every
+
+            self.manager.check_reminders()
+            self.ticks += 1
+
+            # Следующая проверка - через секунду; если до ближайшего события дольше, пропускаем
+            upcoming = max(now + timedelta(seconds=1), _ceil_to_tick(self._next_event(now), self.start))
+            self.clock.set(min(upcoming, self.end))
+            now = self.clock.now()
+
+        return self.report(time.perf_counter() - wall_start)
+
+    def report(self, wall_seconds):
+        fires = self.manager.fires
+        lags = [(fired - due).total_seconds() for _, due, fired in fires]
+        # Повторяющееся напоминание переносится на месте, поэтому срабатывание - это пара (id, время)
+        fire_counts = Counter((reminder_id, due) for reminder_id, due, _ in fires)
+
+        with sqlite3.connect(self.database.db_name) as conn:
+            missed = conn.execute('''
+                SELECT COUNT(*) FROM reminders WHERE status = 'Просрочено' AND due_time <= ?
+            ''', (self.end,)).fetchone()[0]
+
+        def percentile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        virtual_seconds = (self.end - self.start).total_seconds()
+        return {
+            'virtual_days': virtual_seconds / 86400,
+            'wall_seconds': wall_seconds,
+            'speedup': virtual_seconds / wall_seconds if wall_seconds else float('inf'),
+            'ticks_executed': self.ticks,
+            'ticks_skipped': int(virtual_seconds) - self.ticks,
+            'reminders_created': self.workload.created,
+            'fires': len(fires),
+            'duplicate_fires': sum(count - 1 for count in fire_counts.values() if count > 1),
+            'missed': missed,
+            'lag_mean_s': statistics.mean(lags) if lags else 0.0,
+            'lag_p50_s': percentile(lags, 0.50),
+            'lag_p95_s': percentile(lags, 0.95),
+            'lag_p99_s': percentile(lags, 0.99),
+            'lag_max_s': max(lags) if lags else 0.0,
+            'db_calls': dict(self.database.calls),
+            'db_calls_per_virtual_hour': sum(self.database.calls.values()) / (virtual_seconds / 3600),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Симуляция планировщика напоминаний в виртуальном времени")
+    parser.add_argument('--days', type=float, default=7, help="длительность в виртуальных днях")
+    parser.add_argument('--rate', type=float, default=20, help="новых напоминаний в час")
+    parser.add_argument('--refresh-minutes', type=float, default=10, help="период обновления окна")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для отчета в формате JSON")
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR,
+                        help="каталог для временной базы (по умолчанию RAM-диск /dev/shm, если есть)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        simulation = ReminderSimulation(
+            os.path.join(workdir, 'reminders.db'),
+            days=args.days,
+            rate_per_hour=args.rate,
+            refresh_every=timedelta(minutes=args.refresh_minutes),
+            seed=args.seed,
+        )
+        report = simulation.run()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Воспроизводимые синтетические данные для бенчмарков
+
+Все генераторы принимают seed: одинаковый seed дает одинаковые данные.
+"""
+
+import random
+import sqlite3
+from datetime import timedelta
+
+REMINDER_TITLES = (
+    "Позвонить маме", "Оплатить счета", "Стендап", "Принять лекарство", "Полить цветы",
+    "Забрать посылку", "Тренировка", "Отчет по проекту", "Купить продукты", "Встреча с командой",
+)
+
+# Распределение статусов существующих напоминаний
+STATUS_WEIGHTS = (("Ожидает", 70), ("Готово", 15), ("Просрочено", 10), ("Отменено", 5))
+
+# Типичные интервалы повторения: (интервал, единица, вес)
+RECURRING_CHOICES = ((15, 'minutes', 10), (30, 'minutes', 10), (1, 'hours', 30),
+                     (4, 'hours', 10), (1, 'days', 35), (7, 'days', 5))
+
+SERVICES = (
+    "GitHub", "Google", "Telegram", "Yandex", "VK", "Steam", "Amazon", "Slack", "Jira",
+    "GitLab", "Dropbox", "Netflix", "Spotify", "Twitter", "LinkedIn", "Bank", "Mail", "Ozon",
+)
+
+
+def _weighted(rng, choices):
+    values = [choice[:-1] if len(choice) > 2 else choice[0] for choice in choices]
+    weights = [choice[-1] for choice in choices]
+    return rng.choices(values, weights=weights)[0]
+
+
+def _due_offset(rng):
+    """Смещение времени срабатывания относительно «сейчас»
+
+    Большинство напоминаний - в ближайшие часы (экспоненциальное распределение),
+    часть - на дни и недели вперед, небольшая доля - уже в прошлом.
+    """
+    kind = rng.random()
+    if kind < 0.10:
+        return -timedelta(minutes=rng.expovariate(1 / 240))
+    if kind < 0.70:
+        return timedelta(minutes=rng.expovariate(1 / 90))
+    if kind < 0.95:
+        return timedelta(hours=rng.uniform(1, 24 * 7))
+    return timedelta(days=rng.uniform(7, 90))
+
+
+def generate_reminders(n, now, seed=0):
+    """Сгенерировать n строк напоминаний в формате таблицы reminders (без id)"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        due_time = now + _due_offset(rng)
+        status = _weighted(rng, STATUS_WEIGHTS)
+        # Напоминания в прошлом почти никогда не остаются в статусе «Ожидает» надолго
+        if due_time < now - timedelta(minutes=5) and status == "Ожидает":
+            status = "Просрочено"
+
+        is_recurring = rng.random() < 0.2
+        interval, unit = _weighted(rng, RECURRING_CHOICES) if is_recurring else (0, 'minutes')
+        title = f"{rng.choice(REMINDER_TITLES)} #{i}"
+        description = "" if rng.random() < 0.4 else f"Описание напоминания {i}"
+        rows.append((title, description, due_time, status, is_recurring, interval, unit))
+    return rows
+
+
+def populate_reminders(database, n, now, seed=0):
+    """Заполнить ReminderDatabase синтетическими напоминаниями одной транзакцией"""
+    rows = generate_reminders(n, now, seed)
+    with sqlite3.connect(database.db_name) as conn:
+        conn.executemany('''
+            INSERT INTO reminders (title, description, due_time, status, is_recurring, recurring_interval, recurring_unit)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    return len(rows)
+
+
+def generate_vault_entries(n, seed=0):
+    """Сгенерировать n записей хранилища (name, login, password)"""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%"
+    entries = []
+    for i in range(n):
+        service = rng.choice(SERVICES)
+        name = f"{service} {i}"
+        login = f"user{rng.randrange(10 ** 6)}@{service.lower()}.example"
+        length = rng.choice((8, 12, 16, 16, 20, 24))
+        password = ''.join(rng.choice(alphabet) for _ in range(length))
+        entries.append((name, login, password))
+    return entries
+
+
+def populate_vault(db_manager, encryption_manager, n, seed=0):
+    """Заполнить хранилище синтетическими записями (пакетный импорт)"""
+    from vault_io import VaultTransfer
+
+    transfer = VaultTransfer(db_manager, encryption_manager)
+    return transfer.import_records(generate_vault_entries(n, seed))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка синхронизации копий хранилища паролей
+
+Несколько копий passwords.db независимо меняются (добавление, смена пароля,
+удаление) и синхронизируются попарно в случайном порядке. По ходу проверки
+часть копий появляется копированием файла другой копии: у них тот же
+replica_id, и сразу после копирования оригинал и копия меняют одни и те же
+записи - их правки получают одинаковые версии. После финального обмена все
+копии должны совпасть, а повторная синхронизация не должна ничего передавать.
+Код возврата 1, если копии разошлись.
+
+Запуск:
+    python -m benchmarks.vault_sync_check --replicas 3 --copies 3 --rounds 300
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+
+from password_manager import DatabaseManager, EncryptionManager
+from sync_transport import LocalTransport
+from vault_sync import VaultReplica, VaultSync
+
+
+def snapshot(db_manager):
+    """Содержимое копии: uid -> (поля записи, версия); удаленные - (None, версия)"""
+    with sqlite3.connect(db_manager.db_name) as conn:
+        rows = {row[0]: (row[1:6], row[6]) for row in conn.execute(
+            'SELECT uid, name, login, password_encrypted, url, tags, version FROM passwords')}
+        rows.update((uid, (None, version)) for uid, version in conn.execute('SELECT uid, version FROM vault_tombstones'))
+    return rows
+
+
+def random_edit(db_manager, encryption_manager, rng, counter):
+    """Одно случайное изменение копии (counter - источник уникальных названий и паролей)"""
+    names = [entry[1] for entry in db_manager.list_passwords()]
+    action = rng.random()
+    if not names or action < 0.4:
+        number = next(counter)
+        db_manager.add_password(f"Запись {number}", f"user{number}", encryption_manager.encrypt(f"pw-{number}"),
+                                url=f"https://site{number}.example", tags=rng.choice(['', 'work', 'home']))
+    elif action < 0.85:
+        db_manager.update_password(rng.choice(names), encryption_manager.encrypt(f"pw-{next(counter)}"),
+                                   tags=rng.choice([None, 'work', 'home']))
+    else:
+        db_manager.delete_password(rng.choice(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка синхронизации копий хранилища паролей")
+    parser.add_argument('--replicas', type=int, default=3, help="копий, созданных отдельно")
+    parser.add_argument('--copies', type=int, default=3, help="копий, созданных копированием файла")
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        encryption_manager = EncryptionManager(os.path.join(workdir, '.key'))
+        managers = [DatabaseManager(os.path.join(workdir, f'replica{i}.db')) for i in range(args.replicas)]
+        # Моменты, когда появляются копии файлов
+        copy_rounds = sorted(rng.sample(range(args.rounds // 4, args.rounds * 3 // 4), args.copies))
+
+        def sync(left, right):
+            return VaultSync(VaultReplica(managers[left]), LocalTransport(VaultReplica(managers[right]))).sync()
+
+        counter = itertools.count()
+        rekeyed = 0
+        for round_number in range(args.rounds):
+            while copy_rounds and copy_rounds[0] == round_number:
+                copy_rounds.pop(0)
+                source = rng.choice(managers)
+                path = os.path.join(workdir, f'copy{len(managers)}.db')
+                shutil.copyfile(source.db_name, path)
+                copy = DatabaseManager(path)
+                managers.append(copy)
+                # Оригинал и копия меняют одни и те же записи: версии у правок совпадут
+                names = [entry[1] for entry in source.list_passwords()]
+                for name in rng.sample(names, min(3, len(names))):
+                    for db_manager in (source, copy):
+                        db_manager.update_password(name, encryption_manager.encrypt(f"pw-{next(counter)}"))
+            for _ in range(rng.randrange(1, 4)):
+                random_edit(rng.choice(managers), encryption_manager, rng, counter)
+            if rng.random() < 0.3:
+                left, right = rng.sample(range(len(managers)), 2)
+                rekeyed += sync(left, right).rekeyed
+
+        # Два прохода по кольцу доносят все изменения до всех копий
+        for _ in range(2):
+            for i in range(len(managers)):
+                rekeyed += sync(i, (i + 1) % len(managers)).rekeyed
+        snapshots = [snapshot(db_manager) for db_manager in managers]
+        diverged = sum(1 for other in snapshots[1:] if other != snapshots[0])
+        idle = [sync(i, (i + 1) % len(managers)) for i in range(len(managers))]
+        replica_ids = len({db_manager.replica_id for db_manager in managers})
+
+    live = sum(1 for fields, _ in snapshots[0].values() if fields is not None)
+    transferred = sum(report.pulled + report.pushed + report.conflicts for report in idle)
+    print(f"Копий: {len(managers)} (из них копий файла: {args.copies}), раундов: {args.rounds}, "
+          f"записей в итоге: {live}")
+    print(f"Новых идентификаторов после копирования: {rekeyed}, разных replica_id: {replica_ids}")
+    print(f"Разошлось копий: {diverged}, передано при повторной синхронизации: {transferred}")
+    raise SystemExit(1 if diverged or transferred else 0)
+
+
+if __name__ == "__main__":
+    main()
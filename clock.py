@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Источники времени для напоминалки: реальные часы и виртуальные для симуляции
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Реальное время: datetime.now() и time.sleep()"""
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Виртуальное время: sleep() мгновенно сдвигает часы вперед"""
+
+    def __init__(self, start=None):
+        self._now = start or datetime.now()
+        self._lock = threading.Lock()
+
+    def now(self):
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds):
+        self.advance(timedelta(seconds=seconds))
+
+    def advance(self, delta):
+        """Сдвинуть часы на delta"""
+        with self._lock:
+            self._now += delta
+
+    def set(self, moment):
+        """Перевести часы на момент moment (только вперед)"""
+        with self._lock:
+            if moment > self._now:
+                self._now = moment
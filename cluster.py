@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+Кластерный режим напоминалки: несколько узлов делят напоминания через аренды в общей базе
+"""
+
+import math
+import sqlite3
+from datetime import timedelta
+
+# Напоминание с id относится к разделу id % PARTITIONS
+PARTITIONS = 16
+
+# Аренда раздела действует LEASE_TTL; узел продлевает ее каждые LEASE_TTL / 3
+LEASE_TTL = timedelta(seconds=15)
+
+
+class LeaseManager:
+    """Аренды разделов напоминаний для одного узла
+
+    Узел периодически отправляет heartbeat: продлевает свои аренды, забирает
+    свободные и истекшие (узел упал) до справедливой доли и отдает лишние,
+    когда в кластере появляются новые узлы. Раздел упавшего узла переходит
+    к живым не позже чем через LEASE_TTL плюс интервал heartbeat.
+    """
+
+    def __init__(self, database, node_id, partitions=PARTITIONS, lease_ttl=LEASE_TTL):
+        self.database = database
+        self.node_id = node_id
+        self.partitions = partitions
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = lease_ttl / 3
+        self.owned = set()
+        self.last_heartbeat = None
+        self.init_tables()
+
+    def init_tables(self):
+        """Создать таблицы аренд и узлов"""
+        with sqlite3.connect(self.database.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_leases (
+                    partition INTEGER PRIMARY KEY,
+                    owner TEXT,
+                    expires_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_nodes (
+                    node_id TEXT PRIMARY KEY,
+                    heartbeat_at TIMESTAMP NOT NULL
+                )
+            ''')
+            cursor.executemany('INSERT OR IGNORE INTO scheduler_leases (partition) VALUES (?)',
+                               [(partition,) for partition in range(self.partitions)])
+            conn.commit()
+
+    def heartbeat_if_due(self):
+        """Отправить heartbeat, если с прошлого прошло больше heartbeat_interval"""
+        now = self.database.clock.now()
+        if self.last_heartbeat is None or now - self.last_heartbeat >= self.heartbeat_interval:
+            self.heartbeat()
+        return self.owned
+
+    def heartbeat(self):
+        """Продлить свои аренды и перераспределить разделы; вернуть множество своих разделов"""
+        now = self.database.clock.now()
+        expires_at = now + self.lease_ttl
+        with sqlite3.connect(self.database.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                INSERT INTO scheduler_nodes (node_id, heartbeat_at) VALUES (?, ?)
+                ON CONFLICT(node_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+            ''', (self.node_id, now))
+            # Узлы, молчащие дольше десяти аренд, больше не ждем
+            cursor.execute('DELETE FROM scheduler_nodes WHERE heartbeat_at < ?', (now - self.lease_ttl * 10,))
+            cursor.execute('SELECT COUNT(*) FROM scheduler_nodes WHERE heartbeat_at > ?', (now - self.lease_ttl,))
+            share = math.ceil(self.partitions / max(cursor.fetchone()[0], 1))
+
+            cursor.execute('''
+                UPDATE scheduler_leases SET expires_at = ?
+                WHERE owner = ? AND expires_at > ?
+            ''', (expires_at, self.node_id, now))
+            cursor.execute('SELECT partition FROM scheduler_leases WHERE owner = ? AND expires_at > ? ORDER BY partition',
+                           (self.node_id, now))
+            owned = [row[0] for row in cursor.fetchall()]
+
+            if len(owned) > share:
+                # Отдаем лишние разделы новым узлам
+                extra = owned[share:]
+                cursor.executemany('UPDATE scheduler_leases SET owner = NULL, expires_at = NULL WHERE partition = ?',
+                                   [(partition,) for partition in extra])
+                owned = owned[:share]
+            elif len(owned) < share:
+                cursor.execute('''
+                    SELECT partition FROM scheduler_leases
+                    WHERE owner IS NULL OR expires_at <= ?
+                    ORDER BY partition LIMIT ?
+                ''', (now, share - len(owned)))
+                acquired = [row[0] for row in cursor.fetchall()]
+                cursor.executemany('UPDATE scheduler_leases SET owner = ?, expires_at = ? WHERE partition = ?',
+                                   [(self.node_id, expires_at, partition) for partition in acquired])
+                owned.extend(acquired)
+
+            conn.commit()
+
+        self.owned = set(owned)
+        self.last_heartbeat = now
+        return self.owned
+
+    def release_all(self):
+        """Освободить все аренды (при штатной остановке узла)"""
+        with sqlite3.connect(self.database.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE scheduler_leases SET owner = NULL, expires_at = NULL WHERE owner = ?',
+                           (self.node_id,))
+            cursor.execute('DELETE FROM scheduler_nodes WHERE node_id = ?', (self.node_id,))
+            conn.commit()
+        self.owned = set()
+        self.last_heartbeat = None
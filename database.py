@@ -1,9 +1,51 @@
+import itertools
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import uuid
+from datetime import timedelta
+
+from clock import SystemClock
+
+# Приоритеты напоминаний (меньше - важнее)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: "Высокий", PRIORITY_NORMAL: "Обычный", PRIORITY_LOW: "Низкий"}
+
+# Номер колонки priority в строке SELECT * (добавлена миграцией после claimed_at)
+PRIORITY_COLUMN = 11
+
+# Поля, изменения которых попадают в журнал и передаются другим копиям базы
+# (claimed_by/claimed_at относятся к процессам одной машины и не синхронизируются)
+SYNC_COLUMNS = ('title', 'description', 'due_time', 'status', 'is_recurring',
+                'recurring_interval', 'recurring_unit', 'priority')
+
+# Части SQL для триггеров журнала изменений
+_NEXT_LAMPORT_SQL = "COALESCE((SELECT MAX(lamport) FROM reminder_changes), 0) + 1"
+_REPLICA_SQL = "(SELECT value FROM reminder_sync_meta WHERE key = 'replica_id')"
+_NOT_APPLYING_SQL = "NOT EXISTS (SELECT 1 FROM reminder_sync_meta WHERE key = 'applying')"
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+# Сколько экземпляр владеет записью очереди доставки без продления;
+# записи упавшего экземпляра после этого забирает другой (или он сам после перезапуска)
+OUTBOX_LEASE = timedelta(seconds=30)
+
+
+def _snapshot_sql():
+    """Снимок синхронизируемых полей строки в JSON"""
+    return "json_object({})".format(', '.join(f"'{column}', {column}" for column in SYNC_COLUMNS))
+
 
 class ReminderDatabase:
-    def __init__(self, db_name="reminders.db"):
+    def __init__(self, db_name="reminders.db", clock=None):
         self.db_name = db_name
+        self.clock = clock or SystemClock()
+        self._claims = itertools.count(1)
+        self._watch_conn = None  # Отдельное соединение для PRAGMA data_version
+        self._data_version = None
+        self._watch_lock = threading.Lock()
+        self.outbox_lease = OUTBOX_LEASE
         self.init_database()
     
     def init_database(self):
@@ -34,17 +76,128 @@ class ReminderDatabase:
                 cursor.execute('ALTER TABLE reminders ADD COLUMN recurring_interval INTEGER DEFAULT 0')
             if 'recurring_unit' not in columns:
                 cursor.execute('ALTER TABLE reminders ADD COLUMN recurring_unit TEXT DEFAULT "minutes"')
+            # Какой экземпляр приложения показал напоминание (для нескольких процессов)
+            if 'claimed_by' not in columns:
+                cursor.execute('ALTER TABLE reminders ADD COLUMN claimed_by TEXT')
+            if 'claimed_at' not in columns:
+                cursor.execute('ALTER TABLE reminders ADD COLUMN claimed_at TIMESTAMP')
+            if 'priority' not in columns:
+                cursor.execute(f'ALTER TABLE reminders ADD COLUMN priority INTEGER DEFAULT {PRIORITY_NORMAL}')
+            # Для журнала изменений и синхронизации копий
+            if 'uid' not in columns:
+                cursor.execute('ALTER TABLE reminders ADD COLUMN uid TEXT')
+            if 'updated_at' not in columns:
+                cursor.execute('ALTER TABLE reminders ADD COLUMN updated_at TIMESTAMP')
+            if 'change_seq' not in columns:
+                cursor.execute('ALTER TABLE reminders ADD COLUMN change_seq INTEGER')
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_reminders_status_due ON reminders(status, due_time)')
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_reminders_uid ON reminders(uid)')
+            self._init_change_log(cursor)
+            
+            # Очередь доставки: захваченные напоминания до подтверждения пользователем
+            # (pending - еще не показано, delivered - показано, ждет подтверждения)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS delivery_outbox (
+                    reminder_id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    lease_until TIMESTAMP NOT NULL,
+                    enqueued_at TIMESTAMP NOT NULL,
+                    delivered_at TIMESTAMP,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_delivery_outbox_lease ON delivery_outbox(lease_until)')
             
             conn.commit()
     
-    def add_reminder(self, title, description, due_time, is_recurring=False, recurring_interval=0, recurring_unit='minutes'):
+    def _init_change_log(self, cursor):
+        """Журнал изменений: каждую вставку, правку и удаление дописывает триггер
+        
+        seq - местный порядковый номер (по нему другие копии запоминают, докуда
+        дочитали), lamport и origin упорядочивают изменения одной записи между копиями.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminder_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL,
+                op TEXT NOT NULL,
+                row TEXT,
+                lamport INTEGER NOT NULL,
+                origin TEXT NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reminder_changes_uid ON reminder_changes(uid, lamport)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reminder_changes_lamport ON reminder_changes(lamport)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS reminder_sync_meta (key TEXT PRIMARY KEY, value TEXT)')
+        # Докуда (seq другой копии) изменения уже получены
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminder_sync_peers (
+                peer_id TEXT PRIMARY KEY,
+                pulled_seq INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO reminder_sync_meta (key, value) VALUES ('replica_id', ?)",
+                       (uuid.uuid4().hex[:12],))
+        
+        log_change = f'''
+            INSERT INTO reminder_changes (uid, op, row, lamport, origin, updated_at)
+            SELECT uid, 'upsert', {_snapshot_sql()}, {_NEXT_LAMPORT_SQL}, {_REPLICA_SQL}, {_NOW_SQL}
+            FROM reminders WHERE id = new.id;
+            UPDATE reminders SET updated_at = {_NOW_SQL}, change_seq = last_insert_rowid() WHERE id = new.id;
+        '''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reminders_log_insert AFTER INSERT ON reminders
+            WHEN {_NOT_APPLYING_SQL}
+            BEGIN
+                UPDATE reminders SET uid = lower(hex(randomblob(16))) WHERE id = new.id AND uid IS NULL;
+                {log_change}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reminders_log_update AFTER UPDATE OF {', '.join(SYNC_COLUMNS)} ON reminders
+            WHEN {_NOT_APPLYING_SQL}
+            BEGIN
+                {log_change}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reminders_log_delete AFTER DELETE ON reminders
+            WHEN {_NOT_APPLYING_SQL} AND old.uid IS NOT NULL
+            BEGIN
+                INSERT INTO reminder_changes (uid, op, row, lamport, origin, updated_at)
+                VALUES (old.uid, 'delete', NULL, {_NEXT_LAMPORT_SQL}, {_REPLICA_SQL}, {_NOW_SQL});
+            END
+        ''')
+        
+        # Напоминания, созданные до появления журнала, попадают в него по одной записи
+        cursor.execute('SELECT 1 FROM reminders WHERE change_seq IS NULL LIMIT 1')
+        if cursor.fetchone():
+            cursor.execute('UPDATE reminders SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL')
+            cursor.execute(f'''
+                INSERT INTO reminder_changes (uid, op, row, lamport, origin, updated_at)
+                SELECT uid, 'upsert', {_snapshot_sql()}, {_NEXT_LAMPORT_SQL}, {_REPLICA_SQL}, {_NOW_SQL}
+                FROM reminders WHERE change_seq IS NULL
+            ''')
+            cursor.execute(f'''
+                UPDATE reminders SET updated_at = {_NOW_SQL},
+                    change_seq = (SELECT MAX(seq) FROM reminder_changes c WHERE c.uid = reminders.uid)
+                WHERE change_seq IS NULL
+            ''')
+    
+    def add_reminder(self, title, description, due_time, is_recurring=False, recurring_interval=0, recurring_unit='minutes',
+                     priority=PRIORITY_NORMAL):
         """Добавить новое напоминание"""
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Неизвестный приоритет: {priority}")
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO reminders (title, description, due_time, is_recurring, recurring_interval, recurring_unit)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (title, description, due_time, is_recurring, recurring_interval, recurring_unit))
+                INSERT INTO reminders (title, description, due_time, is_recurring, recurring_interval, recurring_unit, priority)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (title, description, due_time, is_recurring, recurring_interval, recurring_unit, priority))
             conn.commit()
             return cursor.lastrowid
     
@@ -57,16 +210,134 @@ class ReminderDatabase:
     
     def get_due_reminders(self):
         """Получить напоминания, которые должны сработать"""
-        now = datetime.now()
+        now = self.clock.now()
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM reminders 
                 WHERE due_time <= ? AND status = 'Ожидает'
-                ORDER BY due_time
+                ORDER BY priority, due_time
             ''', (now,))
             return cursor.fetchall()
     
+    def claim_due_reminders(self, owner, partitions=None):
+        """Атомарно забрать сработавшие напоминания для показа
+        
+        Каждое напоминание достается ровно одному экземпляру приложения,
+        даже если reminders.db открыт несколькими процессами. В кластерном
+        режиме (partitions - число разделов) берутся только напоминания
+        из разделов, аренда которых у owner еще действует.
+        """
+        now = self.clock.now()
+        token = f"{owner}#{next(self._claims)}"
+        condition = "due_time <= ? AND status = 'Ожидает' AND claimed_by IS NULL"
+        params = (now,)
+        if partitions:
+            condition += ''' AND id % ? IN (
+                SELECT partition FROM scheduler_leases WHERE owner = ? AND expires_at > ?
+            )'''
+            params += (partitions, owner, now)
+        
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            # Дешевая проверка без блокировки на запись
+            cursor.execute(f'SELECT 1 FROM reminders WHERE {condition} LIMIT 1', params)
+            if cursor.fetchone() is None:
+                return []
+            
+            # BEGIN IMMEDIATE берет блокировку на запись: второй процесс дождется ее
+            # и увидит напоминания уже занятыми
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'UPDATE reminders SET claimed_by = ?, claimed_at = ? WHERE {condition}',
+                           (token, now) + params)
+            # В той же транзакции напоминания попадают в очередь доставки: после сбоя их покажет другой экземпляр
+            cursor.execute('''
+                INSERT OR IGNORE INTO delivery_outbox (reminder_id, owner, lease_until, enqueued_at)
+                SELECT id, ?, ?, ? FROM reminders WHERE claimed_by = ?
+            ''', (owner, now + self.outbox_lease, now, token))
+            cursor.execute('SELECT * FROM reminders WHERE claimed_by = ? ORDER BY priority, due_time', (token,))
+            claimed = cursor.fetchall()
+            conn.commit()
+            return claimed
+    
+    def mark_delivered(self, reminder_ids, owner):
+        """Отметить показанные напоминания одной транзакцией (групповая фиксация за проверку)"""
+        if not reminder_ids:
+            return
+        now = self.clock.now()
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE delivery_outbox SET state = 'delivered', delivered_at = ?, attempts = attempts + 1
+                WHERE reminder_id = ? AND owner = ?
+            ''', [(now, reminder_id, owner) for reminder_id in reminder_ids])
+            conn.commit()
+    
+    def acknowledge_deliveries(self, reminder_ids):
+        """Подтвердить напоминания одной транзакцией: статус 'Готово' и удаление из очереди доставки"""
+        if not reminder_ids:
+            return
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            params = [(reminder_id,) for reminder_id in reminder_ids]
+            cursor.executemany("UPDATE reminders SET status = 'Готово' WHERE id = ?", params)
+            cursor.executemany('DELETE FROM delivery_outbox WHERE reminder_id = ?', params)
+            conn.commit()
+    
+    def renew_deliveries(self, owner):
+        """Продлить владение своими записями очереди доставки"""
+        now = self.clock.now()
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            conn.execute('UPDATE delivery_outbox SET lease_until = ? WHERE owner = ?', (now + self.outbox_lease, owner))
+            conn.commit()
+    
+    def release_deliveries(self, owner):
+        """Отдать свои записи очереди доставки сразу (при штатном завершении)"""
+        now = self.clock.now()
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            conn.execute('UPDATE delivery_outbox SET lease_until = ? WHERE owner = ?', (now, owner))
+            conn.commit()
+    
+    def recover_deliveries(self, owner):
+        """Забрать записи очереди доставки с истекшим владением (экземпляр упал до подтверждения)
+        
+        Возвращает [(state, напоминание)]: pending нужно показать, delivered - напомнить повторно.
+        Записи удаленных и уже выполненных напоминаний просто удаляются.
+        """
+        now = self.clock.now()
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
+            cursor = conn.cursor()
+            # Дешевая проверка без блокировки на запись
+            cursor.execute('SELECT 1 FROM delivery_outbox WHERE lease_until < ? LIMIT 1', (now,))
+            if cursor.fetchone() is None:
+                return []
+            
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                DELETE FROM delivery_outbox WHERE lease_until < ?
+                AND reminder_id NOT IN (SELECT id FROM reminders WHERE status != 'Готово')
+            ''', (now,))
+            cursor.execute('''
+                SELECT o.state, r.* FROM delivery_outbox o JOIN reminders r ON r.id = o.reminder_id
+                WHERE o.lease_until < ? ORDER BY r.priority, r.due_time
+            ''', (now,))
+            recovered = [(row[0], row[1:]) for row in cursor.fetchall()]
+            cursor.execute('UPDATE delivery_outbox SET owner = ?, lease_until = ? WHERE lease_until < ?',
+                           (owner, now + self.outbox_lease, now))
+            conn.commit()
+            return recovered
+    
+    def has_changed(self):
+        """Изменилась ли база с прошлого вызова (любым соединением, в том числе из другого процесса)"""
+        with self._watch_lock:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            # data_version меняется, когда другое соединение фиксирует изменения
+            version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            changed = version != self._data_version
+            self._data_version = version
+            return changed
+    
     def sort_by_due_time(self, reminders):
         """Сортировка по времени ближайшего срабатывания"""
         return sorted(reminders, key=lambda x: x[3])
@@ -80,22 +351,41 @@ class ReminderDatabase:
             ''', (status, reminder_id))
             conn.commit()
     
+    def update_statuses(self, reminder_ids, status):
+        """Изменить статус сразу нескольких напоминаний одной транзакцией"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE reminders SET status = ? WHERE id = ?
+            ''', [(status, reminder_id) for reminder_id in reminder_ids])
+            conn.commit()
+    
     def delete_reminder(self, reminder_id):
         """Удалить напоминание"""
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
+            cursor.execute('DELETE FROM delivery_outbox WHERE reminder_id = ?', (reminder_id,))
             conn.commit()
     
     def mark_overdue(self):
-        """Перевести просроченные напоминания в статус 'Просрочено'"""
-        now = datetime.now()
+        """Перевести просроченные напоминания в статус 'Просрочено'
+
+        Забранные для показа (claimed_by) не трогаем: они в очереди доставки, показаны
+        или отложены, и их статус выставит подтверждение.
+        """
+        now = self.clock.now()
+        condition = "due_time < ? AND status = 'Ожидает' AND claimed_by IS NULL"
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE reminders 
-                SET status = 'Просрочено' 
-                WHERE due_time < ? AND status = 'Ожидает'
+            # Без подходящих строк не берем блокировку на запись (и не компилируем триггеры журнала)
+            cursor.execute(f'SELECT 1 FROM reminders WHERE {condition} LIMIT 1', (now - timedelta(minutes=1),))
+            if cursor.fetchone() is None:
+                return
+            cursor.execute(f'''
+                UPDATE reminders
+                SET status = 'Просрочено'
+                WHERE {condition}
             ''', (now - timedelta(minutes=1),))
             conn.commit()
     
@@ -114,22 +404,37 @@ class ReminderDatabase:
             return cursor.fetchone()[0]
     
     def process_recurring_reminders(self):
-        """Обработать повторяющиеся напоминания"""
-        now = datetime.now()
-        with sqlite3.connect(self.db_name) as conn:
+        """Обработать повторяющиеся напоминания
+
+        Напоминания из очереди доставки пропускаются: пока их не подтвердили, у показавшего
+        экземпляра взведен таймер повтора или отложенного показа, и перенос дал бы второй показ.
+        Напоминание переносится на месте (uid тот же), поэтому копии, перенесшие его
+        независимо, при синхронизации сходятся к одной записи, а не размножают ее.
+        """
+        now = self.clock.now()
+        query = '''
+            SELECT * FROM reminders 
+            WHERE is_recurring = 1 AND (status = 'Готово' OR status = 'Просрочено')
+            AND id NOT IN (SELECT reminder_id FROM delivery_outbox)
+        '''
+        with sqlite3.connect(self.db_name, timeout=30) as conn:
             cursor = conn.cursor()
             
             # Найти выполненные и просроченные повторяющиеся напоминания
-            cursor.execute('''
-                SELECT * FROM reminders 
-                WHERE is_recurring = 1 AND (status = 'Готово' OR status = 'Просрочено')
-            ''')
+            cursor.execute(query)
+            if not cursor.fetchall():
+                return
+            
+            # Перечитываем под блокировкой на запись, чтобы другой процесс
+            # не перенес те же напоминания второй раз
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(query)
             completed_recurring = cursor.fetchall()
             
             for reminder in completed_recurring:
-                # Создать новое напоминание на основе текущего времени
-                interval = reminder[6]  # recurring_interval
-                unit = reminder[7]      # recurring_unit
+                # Новое время срабатывания считается от текущего момента
+                interval = reminder[7]  # recurring_interval
+                unit = reminder[8]      # recurring_unit
                 
                 # Вычислить новое время от текущего момента
                 if unit == 'minutes':
@@ -141,13 +446,10 @@ class ReminderDatabase:
                 else:
                     new_due_time = now + timedelta(minutes=interval)
                 
-                # Добавить новое напоминание
+                # Перенести напоминание: журнал изменений получит одну правку записи с тем же uid
                 cursor.execute('''
-                    INSERT INTO reminders (title, description, due_time, is_recurring, recurring_interval, recurring_unit)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (reminder[1], reminder[2], new_due_time, 1, interval, unit))
-                
-                # Удалить старое напоминание
-                cursor.execute('DELETE FROM reminders WHERE id = ?', (reminder[0],))
+                    UPDATE reminders SET due_time = ?, status = 'Ожидает', claimed_by = NULL, claimed_at = NULL
+                    WHERE id = ?
+                ''', (new_due_time, reminder[0]))
             
             conn.commit()
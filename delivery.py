@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Очереди доставки уведомлений по приоритетам с ограничением скорости
+"""
+
+from collections import deque
+
+from database import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+
+# Полоса доставки: приоритет -> (уведомлений в секунду, запас токенов)
+DELIVERY_LIMITS = {
+    PRIORITY_HIGH: (10, 20),
+    PRIORITY_NORMAL: (2, 5),
+    PRIORITY_LOW: (0.5, 2),
+}
+
+# Если в полосе низкого приоритета ждут больше уведомлений, они показываются одной сводкой
+AGGREGATE_AFTER = 3
+
+
+class TokenBucket:
+    """Ведро токенов: не больше rate событий в секунду, всплеск до capacity"""
+
+    def __init__(self, rate, capacity, clock):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock.now()
+
+    def _refill(self):
+        now = self.clock.now()
+        elapsed = (now - self.updated).total_seconds()
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def take(self):
+        """Взять токен; False, если лимит исчерпан"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class DeliveryQueues:
+    """Очереди по приоритетам; важные всегда доставляются раньше остальных
+
+    drain() возвращает то, что можно показать сейчас, в порядке приоритета:
+    ('single', напоминание) или ('batch', [напоминания]) для сводки низкого приоритета.
+    """
+
+    def __init__(self, clock, limits=DELIVERY_LIMITS, aggregate_after=AGGREGATE_AFTER):
+        self.lanes = {priority: deque() for priority in sorted(limits)}
+        self.buckets = {priority: TokenBucket(rate, capacity, clock)
+                        for priority, (rate, capacity) in limits.items()}
+        self.aggregate_after = aggregate_after
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def put(self, priority, reminder):
+        """Поставить напоминание в очередь своего приоритета"""
+        lane = self.lanes.get(priority)
+        if lane is None:
+            lane = self.lanes[PRIORITY_NORMAL]
+        lane.append(reminder)
+
+    def drain(self):
+        """Забрать уведомления, которые разрешено показать сейчас"""
+        ready = []
+        for priority, lane in self.lanes.items():
+            bucket = self.buckets[priority]
+            if priority == PRIORITY_LOW and len(lane) > self.aggregate_after:
+                if bucket.take():
+                    ready.append(('batch', list(lane)))
+                    lane.clear()
+                continue
+            while lane and bucket.take():
+                ready.append(('single', lane.popleft()))
+        return ready
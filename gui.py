@@ -3,6 +3,11 @@ from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
 import threading
 
+from database import PRIORITY_COLUMN, PRIORITY_NAMES, PRIORITY_NORMAL
+
+# Как часто проверять, не изменил ли базу другой процесс (мс)
+CHANGE_POLL_MS = 1000
+
 class ReminderApp:
     def __init__(self, database, notification_manager):
         self.database = database
@@ -14,10 +19,9 @@ class ReminderApp:
         self.root.resizable(True, True)
         
         self.setup_ui()
-        self.refresh_reminders()
         
-        # Запускаем мониторинг уведомлений
-        self.notification_manager.start_monitoring()
+        # Загрузка списка и мониторинг запускаются после первой отрисовки окна
+        self.root.after_idle(self._start_background)
         
         # Обработчик закрытия окна
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -117,6 +121,22 @@ class ReminderApp:
         
         self.update_status_bar()
     
+    def _start_background(self):
+        """Отложенная инициализация: список напоминаний и мониторинг уведомлений"""
+        self.database.has_changed()  # Запоминаем текущую версию базы
+        self.refresh_reminders()
+        
+        # Запускаем мониторинг уведомлений
+        self.notification_manager.start_monitoring()
+        
+        self.root.after(CHANGE_POLL_MS, self._poll_changes)
+    
+    def _poll_changes(self):
+        """Обновить список, если базу изменили (другой экземпляр, скрипт или уведомления)"""
+        if self.database.has_changed():
+            self.refresh_reminders()
+        self.root.after(CHANGE_POLL_MS, self._poll_changes)
+    
     def update_status_bar(self):
         """Обновить статус бар"""
         count = self.database.get_reminders_count()
@@ -128,7 +148,7 @@ class ReminderApp:
     
     def set_quick_time(self, minutes):
         """Установить быстрое напоминание"""
-        due_time = datetime.now() + timedelta(minutes=minutes)
+        due_time = self.database.clock.now() + timedelta(minutes=minutes)
         title = f"Быстрое напоминание ({minutes} мин)"
         description = f"Напоминание установлено на {minutes} минут вперед"
         
@@ -175,7 +195,9 @@ class ReminderApp:
         item = self.tree.item(selection[0])
         reminder_id = item['values'][0]
         
-        self.database.update_status(reminder_id, "Готово")
+        # Повторы уведомления больше не нужны; статус и очередь доставки меняются одной транзакцией
+        self.notification_manager.cancel(reminder_id)
+        self.database.acknowledge_deliveries([reminder_id])
         
         # Обработать повторяющиеся напоминания
         self.database.process_recurring_reminders()
@@ -193,6 +215,7 @@ class ReminderApp:
         reminder_id = item['values'][0]
         
         if messagebox.askyesno("Подтверждение", "Удалить это напоминание?"):
+            self.notification_manager.cancel(reminder_id)
             self.database.delete_reminder(reminder_id)
             self.refresh_reminders()
     
@@ -212,6 +235,7 @@ class ReminderApp:
             details += f"Описание: {reminder[2]}\n"
             details += f"Время: {reminder[3]}\n"
             details += f"Статус: {reminder[4]}\n"
+            details += f"Приоритет: {PRIORITY_NAMES.get(reminder[PRIORITY_COLUMN], '-')}\n"
             details += f"Создано: {reminder[5]}"
             
             messagebox.showinfo("Детали напоминания", details)
@@ -234,7 +258,7 @@ class AddReminderDialog:
         
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Добавить напоминание")
-        self.dialog.geometry("450x450")
+        self.dialog.geometry("450x500")
         self.dialog.resizable(False, False)
         self.dialog.transient(parent)
         self.dialog.grab_set()
@@ -270,7 +294,7 @@ class AddReminderDialog:
         time_frame.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(0, 10))
         
         # Устанавливаем время по умолчанию (через 5 минут)
-        default_time = datetime.now() + timedelta(minutes=5)
+        default_time = self.database.clock.now() + timedelta(minutes=5)
         
         self.date_var = tk.StringVar(value=default_time.strftime("%Y-%m-%d"))
         self.time_var = tk.StringVar(value=default_time.strftime("%H:%M"))
@@ -302,11 +326,20 @@ class AddReminderDialog:
         # Скрываем настройки повторения по умолчанию
         self.recurring_frame.grid_remove()
         
+        # Приоритет: важные напоминания показываются раньше остальных
+        priority_frame = ttk.Frame(main_frame)
+        priority_frame.grid(row=9, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+        
+        ttk.Label(priority_frame, text="Приоритет:").pack(side="left", padx=(0, 5))
+        self.priority_var = tk.StringVar(value=PRIORITY_NAMES[PRIORITY_NORMAL])
+        ttk.Combobox(priority_frame, textvariable=self.priority_var,
+                     values=list(PRIORITY_NAMES.values()), state="readonly", width=10).pack(side="left")
+        
         ttk.Label(time_frame, text="(ГГГГ-ММ-ДД ЧЧ:ММ)").pack(side="left", padx=5)
         
         # Кнопки
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=8, column=0, columnspan=2, pady=(20, 0), sticky="ew")
+        button_frame.grid(row=10, column=0, columnspan=2, pady=(20, 0), sticky="ew")
         
         ttk.Button(button_frame, text="Добавить", command=self.add_reminder).pack(side="left", padx=(0, 10))
         ttk.Button(button_frame, text="Отмена", command=self.cancel).pack(side="left")
@@ -335,7 +368,7 @@ class AddReminderDialog:
             time_str = self.time_var.get()
             due_time = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
             
-            if due_time <= datetime.now():
+            if due_time <= self.database.clock.now():
                 messagebox.showerror("Ошибка", "Время напоминания должно быть в будущем!")
                 return
             
@@ -359,7 +392,10 @@ class AddReminderDialog:
                     messagebox.showerror("Ошибка", "Неверный интервал повторения!")
                     return
             
-            self.database.add_reminder(title, description, due_time, is_recurring, recurring_interval, recurring_unit)
+            priority = {name: value for value, name in PRIORITY_NAMES.items()}[self.priority_var.get()]
+            
+            self.database.add_reminder(title, description, due_time, is_recurring, recurring_interval, recurring_unit,
+                                       priority)
             self.result = True
             self.dialog.destroy()
             
@@ -8,6 +8,8 @@
 import sys
 import os
 
+from startup_profile import profiler
+
 # Исправление кодировки для Windows
 if sys.platform.startswith('win'):
     import codecs
@@ -16,22 +18,31 @@ if sys.platform.startswith('win'):
     # Устанавливаем переменную окружения для Python
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from database import ReminderDatabase
-from notifications import NotificationManager
-from gui import ReminderApp
-
 def main():
     """Главная функция приложения"""
     print("Запуск напоминалки...")
     
+    # Модули импортируются здесь, чтобы их загрузка попала в профиль запуска
+    with profiler.phase("импорт database"):
+        from database import ReminderDatabase
+    with profiler.phase("импорт notifications"):
+        from notifications import NotificationManager
+    with profiler.phase("импорт gui (tkinter)"):
+        from gui import ReminderApp
+    
     # Инициализируем базу данных
-    database = ReminderDatabase()
+    with profiler.phase("ReminderDatabase"):
+        database = ReminderDatabase()
     
     # Инициализируем менеджер уведомлений
-    notification_manager = NotificationManager(database)
+    # --cluster: несколько экземпляров делят напоминания через аренды в общей базе
+    with profiler.phase("NotificationManager"):
+        notification_manager = NotificationManager(database, clustered='--cluster' in sys.argv)
     
     # Создаем и запускаем GUI приложение
-    app = ReminderApp(database, notification_manager)
+    with profiler.phase("ReminderApp"):
+        app = ReminderApp(database, notification_manager)
+    profiler.report()
     app.run()
 
 if __name__ == "__main__":
@@ -1,15 +1,41 @@
-import tkinter as tk
-from tkinter import messagebox
+import os
 import threading
-import time
-from datetime import datetime
+import uuid
+from datetime import timedelta
+
+from database import PRIORITY_COLUMN, PRIORITY_NORMAL
+from delivery import DeliveryQueues
+from timing_wheel import TimingWheel
+
+# Повторное уведомление, если напоминание не подтверждено
+ESCALATION_INTERVAL = timedelta(minutes=2)
+MAX_ESCALATIONS = 3
+
+# Кнопки «Отложить» во всплывающем окне (минуты)
+SNOOZE_MINUTES = (5, 15)
+
+# Сколько названий перечислять в сводке уведомлений низкого приоритета
+SUMMARY_TITLES = 5
 
 class NotificationManager:
-    def __init__(self, database):
+    def __init__(self, database, clock=None, clustered=False):
         self.database = database
+        self.clock = clock or database.clock
         self.running = False
         self.notification_thread = None
         self.shown_reminders = set()  # Множество для отслеживания показанных напоминаний
+        self.instance_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"  # Имя экземпляра для захвата напоминаний
+        self.leases = None  # Аренды разделов в кластерном режиме
+        if clustered:
+            from cluster import LeaseManager
+            self.leases = LeaseManager(database, self.instance_id)
+        self.timers = TimingWheel(self.clock.now())  # Отложенные и повторные уведомления
+        self.pending = {}  # id напоминания -> активный таймер
+        self._timers_lock = threading.Lock()
+        self.delivery = DeliveryQueues(self.clock)  # Очереди по приоритетам с ограничением скорости
+        self._acks = set()  # Подтверждения, которые запишутся одной транзакцией на следующей проверке
+        self._acks_lock = threading.Lock()
+        self._outbox_due = None  # Когда продлевать владение очередью доставки и искать брошенные записи
     
     def start_monitoring(self):
         """Запустить мониторинг уведомлений в фоновом режиме"""
@@ -22,37 +48,184 @@ class NotificationManager:
         """Остановить мониторинг уведомлений"""
         self.running = False
         self.shown_reminders.clear()  # Очищаем множество показанных напоминаний
+        if self.leases:
+            self.leases.release_all()  # Разделы сразу достаются другим узлам
+        self._flush_acks()
+        # Непоказанные и неподтвержденные напоминания заберет другой экземпляр или следующий запуск
+        self.database.release_deliveries(self.instance_id)
+        self._outbox_due = None
+        with self._timers_lock:
+            for timer in self.pending.values():
+                self.timers.cancel(timer)
+            self.pending.clear()
     
     def _monitor_reminders(self):
         """Мониторинг напоминаний в фоновом режиме"""
         while self.running:
             try:
-                # Проверяем просроченные напоминания
-                self.database.mark_overdue()
-                
-                # Получаем напоминания, которые должны сработать
-                due_reminders = self.database.get_due_reminders()
-                
-                for reminder in due_reminders:
-                    # Проверяем, не показывали ли мы уже это напоминание
-                    if reminder[0] not in self.shown_reminders:
-                        self.shown_reminders.add(reminder[0])  # Добавляем в множество показанных
-                        self._show_notification(reminder)
-                        # Статус обновляется в _show_popup при закрытии окна
-                
-                time.sleep(1)  # Проверяем каждую секунду
+                self.check_reminders()
+                self.clock.sleep(1)  # Проверяем каждую секунду
             except Exception as e:
                 print(f"Ошибка в мониторинге: {e}")
-                time.sleep(5)
+                self.clock.sleep(5)
+    
+    def check_reminders(self):
+        """Одна проверка: отметить просроченные и показать сработавшие напоминания"""
+        # Сначала срабатывают отложенные и повторные уведомления
+        for payload in self.timers.advance(self.clock.now()):
+            self._on_timer(payload)
+
+        # Проверяем просроченные напоминания
+        self.database.mark_overdue()
+        
+        # Забираем сработавшие напоминания; другие процессы с той же базой их уже не покажут
+        if self.leases:
+            self.leases.heartbeat_if_due()
+            due_reminders = self.database.claim_due_reminders(self.instance_id, self.leases.partitions)
+        else:
+            due_reminders = self.database.claim_due_reminders(self.instance_id)
+        
+        # При запуске и затем раз в треть срока владения: продлеваем свои записи очереди доставки
+        # и забираем записи упавших экземпляров
+        for state, reminder in self._maintain_outbox():
+            if reminder[0] in self.shown_reminders:
+                continue
+            if state == 'pending':
+                due_reminders.append(reminder)
+            else:
+                # Показано, но не подтверждено до сбоя: напоминаем повторно
+                self.shown_reminders.add(reminder[0])
+                self._notify(reminder, 1)
+        
+        for reminder in due_reminders:
+            # Проверяем, не показывали ли мы уже это напоминание
+            if reminder[0] not in self.shown_reminders:
+                self.shown_reminders.add(reminder[0])  # Добавляем в множество показанных
+                priority = reminder[PRIORITY_COLUMN] if len(reminder) > PRIORITY_COLUMN else PRIORITY_NORMAL
+                self.delivery.put(priority, reminder)
+                # Статус обновляется при подтверждении (кнопка OK) или после последнего повтора
+        
+        # Показываем то, что разрешают лимиты полос: важные раньше остальных
+        delivered = []
+        for kind, item in self.delivery.drain():
+            if kind == 'batch':
+                self._notify_summary(item)
+            else:
+                self._notify(item)
+                delivered.append(item[0])
+        
+        # Показанные и подтвержденные за проверку фиксируются пачками, а не по одной транзакции
+        self.database.mark_delivered(delivered, self.instance_id)
+        self._flush_acks()
+        
+        return due_reminders
+    
+    def _maintain_outbox(self):
+        """Продлить владение своими записями очереди доставки и вернуть брошенные (state, напоминание)"""
+        now = self.clock.now()
+        if self._outbox_due is not None and now < self._outbox_due:
+            return []
+        self._outbox_due = now + self.database.outbox_lease / 3
+        self.database.renew_deliveries(self.instance_id)
+        return self.database.recover_deliveries(self.instance_id)
+    
+    def _flush_acks(self):
+        """Записать накопленные подтверждения одной транзакцией"""
+        with self._acks_lock:
+            acks, self._acks = self._acks, set()
+        self.database.acknowledge_deliveries(sorted(acks))
+    
+    def _notify_summary(self, reminders):
+        """Показать одну сводку вместо пачки напоминаний низкого приоритета и отметить их выполненными"""
+        titles = [reminder[1] for reminder in reminders[:SUMMARY_TITLES]]
+        if len(reminders) > SUMMARY_TITLES:
+            titles.append(f"... и еще {len(reminders) - SUMMARY_TITLES}")
+        self._show_notification((0, f"Напоминаний: {len(reminders)}", "\n".join(titles), self.clock.now()))
+        
+        ids = [reminder[0] for reminder in reminders]
+        with self._acks_lock:
+            self._acks.update(ids)
+        self.shown_reminders.difference_update(ids)
+    
+    def _set_timer(self, reminder_id, when, payload):
+        """Заменить активный таймер напоминания новым (без записи в базу)"""
+        with self._timers_lock:
+            old = self.pending.pop(reminder_id, None)
+            if old is not None:
+                self.timers.cancel(old)
+            if payload is not None:
+                self.pending[reminder_id] = self.timers.schedule(when, payload)
+    
+    def _notify(self, reminder, level=0):
+        """Показать уведомление и запланировать повтор, если его не подтвердят"""
+        shown = reminder
+        if level:
+            shown = (reminder[0], f"{reminder[1]} (повтор {level})") + tuple(reminder[2:])
+        if self._show_notification(shown):
+            # У системного уведомления нет кнопок OK и «Отложить»: ответа не будет, показ и есть доставка
+            self.acknowledge(reminder[0])
+            return
+        if reminder[0] > 0:
+            self._set_timer(reminder[0], self.clock.now() + ESCALATION_INTERVAL,
+                            ('escalate', reminder, level + 1))
+    
+    def _on_timer(self, payload):
+        """Обработать сработавший таймер"""
+        kind, reminder, level = payload
+        with self._timers_lock:
+            timer = self.pending.get(reminder[0])
+            if timer is None or timer.payload is not payload:
+                return  # Таймер уже заменен (напоминание отложили или подтвердили)
+            del self.pending[reminder[0]]
+        
+        # Напоминание могли выполнить или удалить в окне приложения или в другом процессе
+        current = self.database.get_reminder_by_id(reminder[0])
+        if current is None or current[4] == 'Готово':
+            self.acknowledge(reminder[0])
+            return
+        
+        if kind == 'escalate' and level > MAX_ESCALATIONS:
+            # Никто не ответил: закрываем напоминание, как раньше при автозакрытии окна
+            self.acknowledge(reminder[0])
+        else:
+            self._notify(reminder, level)
+    
+    def snooze(self, reminder, minutes):
+        """Отложить напоминание на minutes минут; в базу ничего не пишется до срабатывания"""
+        if reminder[0] <= 0:
+            return
+        with self._timers_lock:
+            timer = self.pending.get(reminder[0])
+            if timer is not None:
+                reminder = timer.payload[1]  # Исходная запись, без пометки «повтор» в заголовке
+        self.shown_reminders.add(reminder[0])
+        self._set_timer(reminder[0], self.clock.now() + timedelta(minutes=minutes), ('snooze', reminder, 0))
+    
+    def cancel(self, reminder_id):
+        """Снять повторы и отложенный показ напоминания (его выполнили или удалили в окне)"""
+        self._set_timer(reminder_id, None, None)
+        self.shown_reminders.discard(reminder_id)
+    
+    def acknowledge(self, reminder_id):
+        """Подтвердить напоминание: отменить повторы и отметить выполненным"""
+        if reminder_id <= 0:
+            return
+        self._set_timer(reminder_id, None, None)
+        # Статус записывается вместе с остальными подтверждениями на ближайшей проверке
+        with self._acks_lock:
+            self._acks.add(reminder_id)
+        self.shown_reminders.discard(reminder_id)
     
     def _show_notification(self, reminder):
-        """Показать уведомление"""
+        """Показать уведомление; True, если показано системное уведомление (подтвердить его нельзя)"""
         try:
             # Пробуем системное уведомление
             self._show_system_notification(reminder)
+            return True
         except:
             # Если не получилось, показываем popup
             self._show_popup(reminder)
+            return False
     
     def _show_system_notification(self, reminder):
         """Показать системное уведомление (Windows Toast)"""
@@ -71,6 +244,8 @@ class NotificationManager:
     
     def _show_popup(self, reminder):
         """Показать popup окно"""
+        import tkinter as tk
+        
         popup = tk.Toplevel()
         popup.title("Напоминание")
         popup.geometry("400x250")
@@ -101,29 +276,35 @@ class NotificationManager:
             """Закрыть окно и обновить статус напоминания"""
             popup.destroy()
             # Обновляем статус только для реальных напоминаний (ID > 0)
-            if reminder[0] > 0:
-                self.database.update_status(reminder[0], "Готово")
-                # Удаляем из множества показанных напоминаний
-                self.shown_reminders.discard(reminder[0])
+            self.acknowledge(reminder[0])
+        
+        def snooze_and_close(minutes):
+            """Закрыть окно и отложить напоминание"""
+            popup.destroy()
+            self.snooze(reminder, minutes)
+        
+        buttons = tk.Frame(popup)
+        buttons.pack(pady=20)
         
         # Кнопка закрытия
-        close_button = tk.Button(popup, text="OK", command=close_and_update, width=10, height=2)
-        close_button.pack(pady=20)
+        close_button = tk.Button(buttons, text="OK", command=close_and_update, width=10, height=2)
+        close_button.pack(side=tk.LEFT, padx=5)
         
-        # Автоматическое закрытие через 30 секунд
-        popup.after(30000, close_and_update)
+        if reminder[0] > 0:
+            for minutes in SNOOZE_MINUTES:
+                tk.Button(buttons, text=f"Отложить\n{minutes} мин", width=10, height=2,
+                          command=lambda m=minutes: snooze_and_close(m)).pack(side=tk.LEFT, padx=5)
         
-        # Дополнительная защита: обновляем статус через 5 секунд, если окно еще открыто
-        def force_update_status():
-            if reminder[0] > 0 and reminder[0] in self.shown_reminders:
-                self.database.update_status(reminder[0], "Готово")
-                self.shown_reminders.discard(reminder[0])
+        # Автоматическое закрытие через 30 секунд; без подтверждения уведомление повторится
+        def auto_close():
+            if popup.winfo_exists():
+                popup.destroy()
         
-        popup.after(5000, force_update_status)
+        popup.after(30000, auto_close)
     
     def show_manual_notification(self, title="Тестовое уведомление", message="Это тестовое уведомление"):
         """Показать уведомление вручную"""
-        reminder = (0, title, message, datetime.now())
+        reminder = (0, title, message, self.clock.now())
         self._show_notification(reminder)
     
     def test_notification(self):
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+"""
+Быстрая генерация паролей на криптостойком генераторе (os.urandom)
+"""
+
+import math
+import mmap
+import os
+import secrets
+import string
+import threading
+from array import array
+
+SIMILAR_CHARS = '0OlI'
+
+MODE_CHARS = 'chars'
+MODE_PASSPHRASE = 'passphrase'
+
+# Список слов BIP-39 (английский, 2048 слов = 11 бит энтропии на слово)
+DEFAULT_WORDLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wordlist.txt')
+
+# Размер порции случайных байт, запрашиваемой у os.urandom за один вызов
+RANDOM_CHUNK_SIZE = 65536
+
+
+class PasswordPolicy:
+    """Набор параметров генерации пароля или парольной фразы"""
+
+    # Порядок полей в таблице password_policies
+    FIELDS = ('name', 'mode', 'length', 'use_uppercase', 'use_lowercase', 'use_digits', 'use_special',
+              'exclude_similar', 'require_each_class', 'word_count', 'separator')
+
+    def __init__(self, length=16, use_uppercase=True, use_lowercase=True, use_digits=True, use_special=True,
+                 exclude_similar=False, require_each_class=True, name=None, mode=MODE_CHARS,
+                 word_count=6, separator='-'):
+        self.name = name
+        self.mode = mode
+        self.length = length
+        self.use_uppercase = use_uppercase
+        self.use_lowercase = use_lowercase
+        self.use_digits = use_digits
+        self.use_special = use_special
+        self.exclude_similar = exclude_similar
+        self.require_each_class = require_each_class
+        self.word_count = word_count
+        self.separator = separator
+
+    @classmethod
+    def from_row(cls, row):
+        """Создать политику из строки таблицы password_policies"""
+        values = dict(zip(cls.FIELDS, row))
+        for field in ('use_uppercase', 'use_lowercase', 'use_digits', 'use_special',
+                      'exclude_similar', 'require_each_class'):
+            values[field] = bool(values[field])
+        return cls(**values)
+
+    def to_row(self):
+        """Значения полей в порядке FIELDS"""
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def is_passphrase(self):
+        return self.mode == MODE_PASSPHRASE
+
+    def cache_key(self):
+        """Ключ, по которому кэшируются подготовленные пулы символов"""
+        return (self.use_uppercase, self.use_lowercase, self.use_digits, self.use_special, self.exclude_similar)
+
+    def describe(self):
+        """Краткое описание политики"""
+        if self.is_passphrase():
+            return f"фраза из {self.word_count} слов, разделитель '{self.separator}'"
+
+        classes = [label for flag, label in ((self.use_uppercase, 'A-Z'), (self.use_lowercase, 'a-z'),
+                                             (self.use_digits, '0-9'), (self.use_special, '!@#'))
+                   if flag]
+        similar = ', без 0/O/l/I' if self.exclude_similar else ''
+        return f"{self.length} символов ({' '.join(classes)}{similar})"
+
+    def character_classes(self):
+        """Вернуть список выбранных классов символов"""
+        classes = []
+        if self.use_uppercase:
+            classes.append(string.ascii_uppercase)
+        if self.use_lowercase:
+            classes.append(string.ascii_lowercase)
+        if self.use_digits:
+            classes.append(string.digits)
+        if self.use_special:
+            classes.append(string.punctuation)
+
+        if self.exclude_similar:
+            classes = [''.join(c for c in chars if c not in SIMILAR_CHARS) for chars in classes]
+        return [chars for chars in classes if chars]
+
+
+class RandomSymbols:
+    """Поток равномерно распределенных символов алфавита (до 256 символов)
+
+    Случайные байты переводятся в символы одной операцией bytes.translate:
+    байты из «хвоста», дающего смещение по модулю, удаляются (rejection sampling).
+    """
+
+    def __init__(self, alphabet):
+        size = len(alphabet)
+        if not 0 < size <= 256:
+            raise ValueError("Размер алфавита должен быть от 1 до 256 символов.")
+
+        limit = 256 - 256 % size
+        self.table = bytes(alphabet[b % size] for b in range(256))
+        self.rejected = bytes(range(limit, 256))
+        self.acceptance = limit / 256
+        self.buffer = b''
+        self.pos = 0
+
+    def take(self, count):
+        """Получить count случайных символов"""
+        while len(self.buffer) - self.pos < count:
+            missing = count - (len(self.buffer) - self.pos)
+            raw = os.urandom(max(int(missing / self.acceptance) + 64, RANDOM_CHUNK_SIZE))
+            self.buffer = self.buffer[self.pos:] + raw.translate(self.table, self.rejected)
+            self.pos = 0
+
+        result = self.buffer[self.pos:self.pos + count]
+        self.pos += count
+        return result
+
+
+class WordList:
+    """Список слов в отображенном в память файле с индексом смещений строк"""
+
+    def __init__(self, path=DEFAULT_WORDLIST):
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # offsets[i] - начало i-го слова, offsets[i + 1] - начало следующего
+        offsets = array('I', [0])
+        pos = self._data.find(b'\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = self._data.find(b'\n', pos + 1)
+        if offsets[-1] != len(self._data):
+            offsets.append(len(self._data) + 1)
+        self._offsets = offsets
+
+        if len(self) < 2:
+            raise ValueError("Список слов для парольных фраз пуст.")
+        self.bits_per_word = math.log2(len(self))
+        self._limit = 65536 - 65536 % len(self)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        start = self._offsets[index]
+        return self._data[start:self._offsets[index + 1] - 1].decode('utf-8').strip()
+
+    def random_indexes(self, count):
+        """Получить count равномерно распределенных индексов слов"""
+        size = len(self)
+        result = []
+        while len(result) < count:
+            draws = array('H', os.urandom(2 * (count - len(result) + 8)))
+            result.extend(value % size for value in draws if value < self._limit)
+        return result[:count]
+
+
+_default_wordlist = None
+_wordlist_lock = threading.Lock()
+
+
+def default_wordlist():
+    """Загрузить стандартный список слов один раз при первом обращении"""
+    global _default_wordlist
+    with _wordlist_lock:
+        if _default_wordlist is None:
+            _default_wordlist = WordList()
+        return _default_wordlist
+
+
+class CompiledPolicy:
+    """Заранее подготовленные пулы символов для политики"""
+
+    def __init__(self, policy):
+        classes = policy.character_classes()
+        if not classes:
+            raise ValueError("Не выбраны символы для генерации пароля.")
+
+        pool = ''.join(classes)
+        self.pool = RandomSymbols(pool.encode('ascii'))
+        self.classes = [RandomSymbols(chars.encode('ascii')) for chars in classes]
+        self.positions = {}
+        self.bits_per_char = math.log2(len(pool))
+        self.class_sizes = [len(chars) for chars in classes]
+        self._required_bits = {}
+
+    def required_class_bits(self, length):
+        """Точная энтропия пароля, в котором generate_many ставит по символу каждого класса
+
+        Остальные length - k позиций равномерны по всему пулу, поэтому пароль с n_i
+        символами класса i выпадает с вероятностью, пропорциональной n_1 * ... * n_k.
+        Отсюда H = (length - k) * log2(N) + log2(length! / (length - k)!) + sum(log2 |c_i|)
+        - sum(E[log2(1 + m_i)]), где m_i ~ Binomial(length - k, |c_i| / N).
+        """
+        bits = self._required_bits.get(length)
+        if bits is not None:
+            return bits
+
+        free = length - len(self.class_sizes)
+        total = sum(self.class_sizes)
+        # log2(length! / free!) через lgamma: факториалы длинных паролей не помещаются во float
+        bits = free * self.bits_per_char + (math.lgamma(length + 1) - math.lgamma(free + 1)) / math.log(2)
+        for size in self.class_sizes:
+            bits += math.log2(size) - self._expected_log2_count(free, size / total)
+        self._required_bits[length] = bits
+        return bits
+
+    @staticmethod
+    def _expected_log2_count(trials, p):
+        """E[log2(1 + m)] для m ~ Binomial(trials, p)
+
+        Вероятности считаются в логарифмах (без переполнения на длинных паролях), а
+        суммируются только значения в пределах 12 стандартных отклонений от среднего:
+        остальные вносят меньше 1e-30.
+        """
+        if p >= 1:
+            return math.log2(1 + trials)
+        mean, spread = trials * p, 12 * math.sqrt(trials * p * (1 - p)) + 12
+        log_p, log_q, log_all = math.log(p), math.log1p(-p), math.lgamma(trials + 1)
+        expected = 0.0
+        for m in range(max(0, int(mean - spread)), min(trials, int(mean + spread)) + 1):
+            log_pmf = log_all - math.lgamma(m + 1) - math.lgamma(trials - m + 1) + m * log_p + (trials - m) * log_q
+            expected += math.exp(log_pmf) * math.log2(1 + m)
+        return expected
+
+    def position_source(self, modulus):
+        """Источник случайных индексов в диапазоне [0, modulus)"""
+        source = self.positions.get(modulus)
+        if source is None and modulus <= 256:
+            source = self.positions[modulus] = RandomSymbols(bytes(range(modulus)))
+        return source
+
+
+class PasswordEngine:
+    """Пакетный генератор паролей с кэшем подготовленных политик"""
+
+    def __init__(self, wordlist=None):
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self._wordlist = wordlist
+
+    @property
+    def wordlist(self):
+        if self._wordlist is None:
+            self._wordlist = default_wordlist()
+        return self._wordlist
+
+    def _compile(self, policy):
+        key = policy.cache_key()
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = CompiledPolicy(policy)
+        return compiled
+
+    def _random_below(self, compiled, modulus, count):
+        """Получить count случайных индексов в диапазоне [0, modulus)"""
+        source = compiled.position_source(modulus)
+        if source is None:
+            return [secrets.randbelow(modulus) for _ in range(count)]
+        return source.take(count)
+
+    def entropy_bits(self, policy):
+        """Энтропия пароля в битах с учетом того, как он строится в generate_many"""
+        if policy.is_passphrase():
+            return policy.word_count * self.wordlist.bits_per_word
+        with self._lock:
+            compiled = self._compile(policy)
+            # Обязательные символы классов делают распределение неравномерным
+            if policy.require_each_class and len(compiled.classes) <= policy.length:
+                return compiled.required_class_bits(policy.length)
+        return policy.length * compiled.bits_per_char
+
+    def generate_passphrases(self, n, policy):
+        """Сгенерировать n парольных фраз из списка слов"""
+        if policy.word_count < 1:
+            raise ValueError("Количество слов должно быть положительным.")
+
+        wordlist = self.wordlist
+        indexes = wordlist.random_indexes(n * policy.word_count)
+        words = [wordlist[i] for i in indexes]
+        step = policy.word_count
+        return [policy.separator.join(words[i:i + step]) for i in range(0, len(words), step)]
+
+    def generate_many(self, n, policy):
+        """Сгенерировать n паролей по политике"""
+        if policy.is_passphrase():
+            return self.generate_passphrases(n, policy)
+
+        length = policy.length
+        if length < 1:
+            raise ValueError("Длина пароля должна быть положительной.")
+
+        required = 0
+        with self._lock:
+            compiled = self._compile(policy)
+            fill = compiled.pool.take(n * length)
+            if policy.require_each_class and len(compiled.classes) <= length:
+                required = len(compiled.classes)
+                class_chars = [source.take(n) for source in compiled.classes]
+                offsets = [self._random_below(compiled, length - k, n) for k in range(required)]
+
+        if required == 0:
+            return [fill[i:i + length].decode('ascii') for i in range(0, n * length, length)]
+
+        # По одному символу каждого класса ставим на случайные различные позиции
+        passwords = []
+        for i in range(n):
+            buffer = bytearray(fill[i * length:(i + 1) * length])
+            swaps = {}
+            for k in range(required):
+                # Частичное перемешивание Фишера-Йетса: выбираем k-ю позицию без повторов
+                j = k + offsets[k][i]
+                position = swaps.get(j, j)
+                swaps[j] = swaps.get(k, k)
+                buffer[position] = class_chars[k][i]
+            passwords.append(buffer.decode('ascii'))
+        return passwords
+
+    def generate(self, policy):
+        """Сгенерировать один пароль по политике"""
+        return self.generate_many(1, policy)[0]
@@ -8,6 +8,8 @@ CLI-приложение для хранения паролей с шифров
 import sys
 import os
 
+from startup_profile import profiler
+
 # Исправление кодировки для Windows
 if sys.platform.startswith('win'):
     import codecs
@@ -17,15 +19,37 @@ if sys.platform.startswith('win'):
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
 import sqlite3
+import base64
 import hashlib
-import string
-import random
 import getpass
-from cryptography.fernet import Fernet
+import json
+import uuid
+
+from password_engine import MODE_PASSPHRASE, PasswordEngine, PasswordPolicy
+
+# cryptography и модули импорта/проверки/поиска загружаются при первом использовании
+profiler.mark("импорт модулей")
+
+DEFAULT_POLICIES = (
+    PasswordPolicy(name='Стандартный', length=16),
+    PasswordPolicy(name='Без похожих символов', length=16, exclude_similar=True),
+    PasswordPolicy(name='Парольная фраза', mode=MODE_PASSPHRASE, word_count=6, separator='-'),
+)
+
+# Формат пароля в базе: версия (1 байт) + nonce (12 байт) + шифртекст AES-GCM с тегом
+STORAGE_FORMAT_AESGCM = 1
+STORAGE_NONCE_SIZE = 12
+
+# Сколько прежних паролей записи хранится в истории (0 - история не ведется)
+PASSWORD_HISTORY_LIMIT = 10
+
 
 class DatabaseManager:
-    def __init__(self, db_name: str = "passwords.db") -> None:
+    def __init__(self, db_name: str = "passwords.db", history_limit: int = PASSWORD_HISTORY_LIMIT) -> None:
+        if history_limit < 0:
+            raise ValueError("Размер истории не может быть отрицательным")
         self.db_name = db_name
+        self.history_limit = history_limit
         self.init_database()
     
     def init_database(self):
@@ -47,11 +71,88 @@ class DatabaseManager:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL,
                     login TEXT NOT NULL,
-                    password_encrypted TEXT NOT NULL,
-                    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    password_encrypted BLOB NOT NULL,
+                    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    url TEXT DEFAULT '',
+                    tags TEXT DEFAULT ''
+                )
+            ''')
+            
+            # Проверяем, есть ли новые поля, и добавляем их если нужно
+            cursor.execute('PRAGMA table_info(passwords)')
+            columns = [col[1] for col in cursor.fetchall()]
+            
+            if 'url' not in columns:
+                cursor.execute("ALTER TABLE passwords ADD COLUMN url TEXT DEFAULT ''")
+            if 'tags' not in columns:
+                cursor.execute("ALTER TABLE passwords ADD COLUMN tags TEXT DEFAULT ''")
+            # Для синхронизации: глобальный идентификатор записи и вектор версий
+            if 'uid' not in columns:
+                cursor.execute("ALTER TABLE passwords ADD COLUMN uid TEXT")
+            if 'version' not in columns:
+                cursor.execute("ALTER TABLE passwords ADD COLUMN version TEXT DEFAULT ''")
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_passwords_uid ON passwords(uid)')
+            # Покрывающий индекс: поиск по названию и список записей без чтения шифртекстов
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_passwords_name ON passwords(name, login, created_time)')
+            
+            # Прежние пароли записей; в passwords всегда только текущая версия
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS password_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    entry_id INTEGER NOT NULL,
+                    password_encrypted BLOB NOT NULL,
+                    replaced_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_password_history_entry ON password_history(entry_id, id)')
+            
+            # Удаленные записи: нужны, чтобы удаление дошло до других копий хранилища
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS vault_tombstones (
+                    uid TEXT PRIMARY KEY,
+                    version TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS vault_sync_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO vault_sync_meta (key, value) VALUES ('replica_id', ?)",
+                           (uuid.uuid4().hex[:12],))
+            cursor.execute("SELECT value FROM vault_sync_meta WHERE key = 'replica_id'")
+            self.replica_id = cursor.fetchone()[0]
+            
+            # Записи, созданные до появления синхронизации, получают идентификатор и версию
+            cursor.execute('SELECT id FROM passwords WHERE uid IS NULL')
+            cursor.executemany('UPDATE passwords SET uid = ?, version = ? WHERE id = ?',
+                               [(uuid.uuid4().hex, self.new_version(), row[0]) for row in cursor.fetchall()])
+            
+            # Таблица для именованных политик генерации
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS password_policies (
+                    name TEXT PRIMARY KEY,
+                    mode TEXT NOT NULL DEFAULT 'chars',
+                    length INTEGER NOT NULL DEFAULT 16,
+                    use_uppercase BOOLEAN DEFAULT 1,
+                    use_lowercase BOOLEAN DEFAULT 1,
+                    use_digits BOOLEAN DEFAULT 1,
+                    use_special BOOLEAN DEFAULT 1,
+                    exclude_similar BOOLEAN DEFAULT 0,
+                    require_each_class BOOLEAN DEFAULT 1,
+                    word_count INTEGER DEFAULT 6,
+                    separator TEXT DEFAULT '-'
                 )
             ''')
             
+            # Стандартные политики создаются один раз
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO password_policies ({', '.join(PasswordPolicy.FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(PasswordPolicy.FIELDS))})",
+                [policy.to_row() for policy in DEFAULT_POLICIES]
+            )
+            
             conn.commit()
     
     def set_master_password(self, password):
@@ -87,24 +188,178 @@ class DatabaseManager:
         input_hash = hashlib.sha256(password.encode()).hexdigest()
         return input_hash == stored_hash
     
-    def add_password(self, name, login, encrypted_password):
+    def reset_replica_id(self):
+        """Выдать этой копии хранилища новый идентификатор (файл скопирован с другой копии)"""
+        replica_id = uuid.uuid4().hex[:12]
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("UPDATE vault_sync_meta SET value = ? WHERE key = 'replica_id'", (replica_id,))
+            conn.commit()
+        self.replica_id = replica_id
+        return replica_id
+    
+    def new_version(self):
+        """Вектор версий новой записи, созданной в этой копии хранилища"""
+        return json.dumps({self.replica_id: 1}, sort_keys=True, separators=(',', ':'))
+    
+    def bump_version(self, version):
+        """Вектор версий после изменения записи в этой копии хранилища"""
+        vector = json.loads(version) if version else {}
+        vector[self.replica_id] = vector.get(self.replica_id, 0) + 1
+        return json.dumps(vector, sort_keys=True, separators=(',', ':'))
+    
+    def add_password(self, name, login, encrypted_password, url='', tags=''):
         """Добавить пароль"""
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO passwords (name, login, password_encrypted)
-                VALUES (?, ?, ?)
-            ''', (name, login, encrypted_password))
+                INSERT INTO passwords (name, login, password_encrypted, url, tags, uid, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, login, encrypted_password, url, tags, uuid.uuid4().hex, self.new_version()))
             conn.commit()
             return cursor.lastrowid
-    
+
+    def add_passwords_bulk(self, rows):
+        """Добавить пачку паролей одной транзакцией (rows: name, login, password_encrypted, url, tags)"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            version = self.new_version()
+            cursor.executemany('''
+                INSERT INTO passwords (name, login, password_encrypted, url, tags, uid, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(name, login, encrypted, url, tags, uuid.uuid4().hex, version)
+                  for name, login, encrypted, url, tags in rows])
+            conn.commit()
+            return cursor.rowcount
+
+    def iter_passwords(self, chunk_size=1000):
+        """Постранично выдать все записи (id, name, login, password_encrypted, url, tags)"""
+        last_id = 0
+        while True:
+            with sqlite3.connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, name, login, password_encrypted, url, tags FROM passwords
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, chunk_size))
+                rows = cursor.fetchall()
+
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            yield rows
+
+    def count_legacy_passwords(self):
+        """Сколько паролей еще хранится текстовыми токенами Fernet"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM passwords WHERE typeof(password_encrypted) = 'text'")
+            return cursor.fetchone()[0]
+
+    def iter_legacy_passwords(self, chunk_size=1000):
+        """Постранично выдать записи в старом формате (id, name, login, password_encrypted)"""
+        last_id = 0
+        while True:
+            with sqlite3.connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, name, login, password_encrypted FROM passwords
+                    WHERE id > ? AND typeof(password_encrypted) = 'text' ORDER BY id LIMIT ?
+                ''', (last_id, chunk_size))
+                rows = cursor.fetchall()
+
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            yield rows
+
+    def update_ciphertexts(self, rows):
+        """Заменить шифртексты пачки записей одной транзакцией (rows: id, password_encrypted)"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE passwords SET password_encrypted = ? WHERE id = ?
+            ''', [(encrypted, entry_id) for entry_id, encrypted in rows])
+            conn.commit()
+
     def get_password(self, name):
-        """Получить пароль по названию"""
+        """Получить пароль по названию (при одинаковых названиях - самую раннюю запись)"""
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM passwords WHERE name = ?', (name,))
+            cursor.execute('SELECT * FROM passwords WHERE name = ? ORDER BY id LIMIT 1', (name,))
             return cursor.fetchone()
     
+    def get_encrypted_password(self, entry_id):
+        """Шифртекст пароля записи по id (None, если записи нет)"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT password_encrypted FROM passwords WHERE id = ?', (entry_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def update_password(self, name, encrypted_password, login=None, url=None, tags=None):
+        """Заменить пароль записи (и при необходимости логин, адрес, теги), сохранив прежний в истории
+        
+        Запись сохраняет id и uid; версия увеличивается, чтобы изменение дошло до других копий.
+        """
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, password_encrypted, version FROM passwords WHERE name = ? ORDER BY id LIMIT 1',
+                           (name,))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            entry_id, previous, version = row
+            
+            cursor.execute('''
+                UPDATE passwords SET password_encrypted = ?, login = COALESCE(?, login), url = COALESCE(?, url),
+                    tags = COALESCE(?, tags), version = ?
+                WHERE id = ?
+            ''', (encrypted_password, login, url, tags, self.bump_version(version), entry_id))
+            self.record_history(cursor, entry_id, previous)
+            conn.commit()
+            return True
+    
+    def record_history(self, cursor, entry_id, previous):
+        """Сохранить прежний пароль записи в истории и отбросить лишние (внутри транзакции вызывающего)"""
+        if not self.history_limit:
+            return
+        cursor.execute('INSERT INTO password_history (entry_id, password_encrypted) VALUES (?, ?)',
+                       (entry_id, previous))
+        cursor.execute('''
+            DELETE FROM password_history WHERE entry_id = ? AND id <= (
+                SELECT id FROM password_history WHERE entry_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (entry_id, entry_id, self.history_limit))
+    
+    def get_password_history(self, name):
+        """Прежние пароли записи, новые первыми: (password_encrypted, replaced_time)"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT h.password_encrypted, h.replaced_time FROM password_history h
+                WHERE h.entry_id = (SELECT id FROM passwords WHERE name = ? ORDER BY id LIMIT 1)
+                ORDER BY h.id DESC
+            ''', (name,))
+            return cursor.fetchall()
+    
+    def prune_history(self, limit=None):
+        """Оставить у каждой записи не больше limit прежних паролей (по умолчанию history_limit)"""
+        limit = self.history_limit if limit is None else limit
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM password_history WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY entry_id ORDER BY id DESC) AS position
+                        FROM password_history
+                    ) WHERE position > ?
+                )
+            ''', (limit,))
+            conn.commit()
+            return cursor.rowcount
+    
     def list_passwords(self):
         """Получить список всех паролей"""
         with sqlite3.connect(self.db_name) as conn:
@@ -116,19 +371,66 @@ class DatabaseManager:
         """Удалить пароль"""
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT uid, version FROM passwords WHERE name = ?', (name,))
+            cursor.executemany('INSERT OR REPLACE INTO vault_tombstones (uid, version) VALUES (?, ?)',
+                               [(uid, self.bump_version(version)) for uid, version in cursor.fetchall()])
+            # Прежние пароли удаляемой записи тоже не должны оставаться в базе
+            cursor.execute('DELETE FROM password_history WHERE entry_id IN (SELECT id FROM passwords WHERE name = ?)',
+                           (name,))
             cursor.execute('DELETE FROM passwords WHERE name = ?', (name,))
             conn.commit()
             return cursor.rowcount > 0
+    
+    def save_policy(self, policy):
+        """Сохранить (или заменить) именованную политику генерации"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"INSERT OR REPLACE INTO password_policies ({', '.join(PasswordPolicy.FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(PasswordPolicy.FIELDS))})",
+                policy.to_row()
+            )
+            conn.commit()
+    
+    def list_policies(self):
+        """Получить все политики генерации"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(PasswordPolicy.FIELDS)} FROM password_policies ORDER BY name")
+            return [PasswordPolicy.from_row(row) for row in cursor.fetchall()]
+    
+    def delete_policy(self, name):
+        """Удалить политику генерации"""
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM password_policies WHERE name = ?', (name,))
+            conn.commit()
+            return cursor.rowcount > 0
 
 
 class EncryptionManager:
     def __init__(self, key_file=".key"):
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
         self.key_file = key_file
         self.key = self._load_or_generate_key()
-        self.cipher = Fernet(self.key)
+        self.cipher = Fernet(self.key)  # Старый формат: нужен только для чтения
+        self.aead = AESGCM(self._derive_storage_key())
+        self._header = bytes([STORAGE_FORMAT_AESGCM])
+    
+    def _derive_storage_key(self):
+        """Ключ AES-256-GCM для записей хранилища, выведенный из ключа в файле"""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'vault-storage-v1')
+        return hkdf.derive(base64.urlsafe_b64decode(self.key))
     
     def _load_or_generate_key(self):
         """Загрузить существующий ключ или сгенерировать новый"""
+        from cryptography.fernet import Fernet
+        
         if os.path.exists(self.key_file):
             with open(self.key_file, 'rb') as f:
                 return f.read()
@@ -139,12 +441,18 @@ class EncryptionManager:
             return key
     
     def encrypt(self, data):
-        """Зашифровать данные"""
-        return self.cipher.encrypt(data.encode()).decode()
+        """Зашифровать данные в двоичный формат хранения"""
+        nonce = os.urandom(STORAGE_NONCE_SIZE)
+        return self._header + nonce + self.aead.encrypt(nonce, data.encode(), self._header)
     
     def decrypt(self, encrypted_data):
-        """Расшифровать данные"""
-        return self.cipher.decrypt(encrypted_data.encode()).decode()
+        """Расшифровать данные (двоичный формат или токен Fernet из старых версий)"""
+        if isinstance(encrypted_data, str):
+            return self.cipher.decrypt(encrypted_data.encode()).decode()
+        if encrypted_data[:1] != self._header:
+            raise ValueError("Неизвестный формат зашифрованных данных.")
+        nonce = encrypted_data[1:1 + STORAGE_NONCE_SIZE]
+        return self.aead.decrypt(nonce, encrypted_data[1 + STORAGE_NONCE_SIZE:], self._header).decode()
 
 
 class PasswordGenerator:
@@ -155,61 +463,103 @@ class PasswordGenerator:
         self.use_digits = use_digits
         self.use_special = use_special
         self.exclude_similar = exclude_similar
+        self.engine = PasswordEngine()
     
-    def generate(self, length=16, use_uppercase=True, use_lowercase=True, use_digits=True, use_special=True, exclude_similar=False):
-        """Генерировать пароль с заданными параметрами"""
-        character_pool = ""
-        
-        if use_uppercase:
-            character_pool += string.ascii_uppercase
-        if use_lowercase:
-            character_pool += string.ascii_lowercase
-        if use_digits:
-            character_pool += string.digits
-        if use_special:
-            character_pool += string.punctuation
-        
-        if not character_pool:
-            raise ValueError("Не выбраны символы для генерации пароля.")
-        
-        # ПРОДВИНУТОЕ ЗАДАНИЕ: Проверка на похожие символы с перегенерацией
-        if exclude_similar:
-            max_attempts = 100  # Ограничиваем количество попыток
-            for attempt in range(max_attempts):
-                password = ''.join(random.choice(character_pool) for _ in range(length))
-                
-                # Проверяем, есть ли похожие символы в одном пароле
-                similar_chars = ['0', 'O', 'l', 'I']
-                has_similar = False
-                
-                for char in similar_chars:
-                    if char in password:
-                        # Проверяем, есть ли другая похожая буква в том же пароле
-                        for other_char in similar_chars:
-                            if other_char != char and other_char in password:
-                                has_similar = True
-                                break
-                        if has_similar:
-                            break
-                
-                # Если похожих символов нет или только один, возвращаем пароль
-                if not has_similar:
-                    return password
-            
-            # Если не удалось сгенерировать подходящий пароль, возвращаем обычный
-            print("Предупреждение: Не удалось сгенерировать пароль без похожих символов. Возвращаем обычный пароль.")
-            return ''.join(random.choice(character_pool) for _ in range(length))
-        else:
-            # Обычная генерация без проверки
-            password = ''.join(random.choice(character_pool) for _ in range(length))
-            return password
+    def default_policy(self):
+        """Политика из параметров, заданных при создании генератора"""
+        return PasswordPolicy(
+            length=self.length,
+            use_uppercase=self.use_uppercase,
+            use_lowercase=self.use_lowercase,
+            use_digits=self.use_digits,
+            use_special=self.use_special,
+            exclude_similar=self.exclude_similar
+        )
+    
+    def generate(self, length=None, use_uppercase=None, use_lowercase=None, use_digits=None, use_special=None, exclude_similar=None):
+        """Генерировать пароль с заданными параметрами (не заданные берутся из настроек генератора)"""
+        # ПРОДВИНУТОЕ ЗАДАНИЕ: похожие символы (0/O, l/I) исключаются из пула заранее,
+        # поэтому перегенерация не требуется
+        policy = PasswordPolicy(
+            length=self.length if length is None else length,
+            use_uppercase=self.use_uppercase if use_uppercase is None else use_uppercase,
+            use_lowercase=self.use_lowercase if use_lowercase is None else use_lowercase,
+            use_digits=self.use_digits if use_digits is None else use_digits,
+            use_special=self.use_special if use_special is None else use_special,
+            exclude_similar=self.exclude_similar if exclude_similar is None else exclude_similar
+        )
+        return self.engine.generate(policy)
+    
+    def generate_by_policy(self, policy):
+        """Генерировать пароль или парольную фразу по политике"""
+        return self.engine.generate(policy)
+    
+    def entropy_bits(self, policy):
+        """Оценка энтропии пароля по политике в битах"""
+        return self.engine.entropy_bits(policy)
+    
+    def generate_many(self, n, policy=None):
+        """Сгенерировать пачку из n паролей по политике"""
+        return self.engine.generate_many(n, policy or self.default_policy())
 
 
 class PasswordManager:
     def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.encryption_manager = EncryptionManager()
-        self.password_generator = PasswordGenerator()
+        # Компоненты создаются при первом обращении: например, просмотр списка
+        # не загружает cryptography и не читает файл ключа
+        self._db_manager = None
+        self._encryption_manager = None
+        self._password_generator = None
+        self._policies = None
+        self._search_index = None
+    
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            with profiler.phase("DatabaseManager"):
+                self._db_manager = DatabaseManager()
+        return self._db_manager
+    
+    @db_manager.setter
+    def db_manager(self, value):
+        self._db_manager = value
+    
+    @property
+    def encryption_manager(self):
+        if self._encryption_manager is None:
+            with profiler.phase("EncryptionManager"):
+                self._encryption_manager = EncryptionManager()
+        return self._encryption_manager
+    
+    @encryption_manager.setter
+    def encryption_manager(self, value):
+        self._encryption_manager = value
+    
+    @property
+    def password_generator(self):
+        if self._password_generator is None:
+            with profiler.phase("PasswordGenerator"):
+                self._password_generator = PasswordGenerator()
+        return self._password_generator
+    
+    @password_generator.setter
+    def password_generator(self, value):
+        self._password_generator = value
+    
+    @property
+    def search_index(self):
+        """Поисковый индекс по метаданным (создается при первом поиске)"""
+        if self._search_index is None:
+            from vault_search import VaultSearchIndex
+            self._search_index = VaultSearchIndex(self.db_manager)
+        return self._search_index
+    
+    @property
+    def policies(self):
+        """Политики генерации из базы данных (загружаются один раз)"""
+        if self._policies is None:
+            self._policies = {policy.name: policy for policy in self.db_manager.list_policies()}
+        return self._policies
     
     def setup_master_password(self):
         """Установить мастер-пароль при первом запуске"""
@@ -254,6 +604,15 @@ class PasswordManager:
         
         return False
     
+    def upgrade_storage(self):
+        """Перевести пароли старого формата (текстовые токены Fernet) в двоичный"""
+        if not self.db_manager.count_legacy_passwords():
+            return
+        from vault_io import VaultTransfer
+        
+        migrated = VaultTransfer(self.db_manager, self.encryption_manager).migrate_storage()
+        print(f"Формат хранения обновлен для {migrated} записей.")
+    
     def add_password(self):
         """Добавить новый пароль"""
         print("\n--- Добавление нового пароля ---")
@@ -268,6 +627,9 @@ class PasswordManager:
             print("Логин не может быть пустым.")
             return
         
+        url = input("Адрес сайта (необязательно): ").strip()
+        tags = input("Теги через пробел (необязательно): ").strip()
+        
         # Генерируем пароль
         password = self.generate_password_interactive()
         if not password:
@@ -275,39 +637,86 @@ class PasswordManager:
         
         # Шифруем и сохраняем
         encrypted_password = self.encryption_manager.encrypt(password)
-        self.db_manager.add_password(name, login, encrypted_password)
+        self.db_manager.add_password(name, login, encrypted_password, url=url, tags=tags)
         
         print(f"\nПароль для '{name}' успешно сохранен!")
     
+    def ask_policy_options(self):
+        """Запросить параметры генерации у пользователя"""
+        if input("Парольная фраза из слов вместо пароля? (да/нет): ").lower() == 'да':
+            word_count = int(input("Количество слов (по умолчанию 6): ") or 6)
+            separator = input("Разделитель слов (по умолчанию '-'): ") or '-'
+            return PasswordPolicy(mode=MODE_PASSPHRASE, word_count=word_count, separator=separator)
+        
+        length = int(input(f"Длина пароля (по умолчанию 16): ") or 16)
+        use_uppercase = input("Использовать заглавные буквы? (да/нет): ").lower() == 'да'
+        use_lowercase = input("Использовать строчные буквы? (да/нет): ").lower() == 'да'
+        use_digits = input("Использовать цифры? (да/нет): ").lower() == 'да'
+        use_special = input("Использовать спецсимволы? (да/нет): ").lower() == 'да'
+        
+        # ПРОДВИНУТОЕ ЗАДАНИЕ: Вопрос об исключении похожих символов
+        exclude_similar = input("Исключить похожие символы (0/O, l/I)? (да/нет): ").lower() == 'да'
+        
+        return PasswordPolicy(
+            length=length,
+            use_uppercase=use_uppercase,
+            use_lowercase=use_lowercase,
+            use_digits=use_digits,
+            use_special=use_special,
+            exclude_similar=exclude_similar  # ПРОДВИНУТОЕ ЗАДАНИЕ: Передаем новый параметр
+        )
+    
     def generate_password_interactive(self):
         """Интерактивная генерация пароля"""
         print("\n--- Генерация нового пароля ---")
         try:
-            length = int(input(f"Длина пароля (по умолчанию 16): ") or 16)
-            use_uppercase = input("Использовать заглавные буквы? (да/нет): ").lower() == 'да'
-            use_lowercase = input("Использовать строчные буквы? (да/нет): ").lower() == 'да'
-            use_digits = input("Использовать цифры? (да/нет): ").lower() == 'да'
-            use_special = input("Использовать спецсимволы? (да/нет): ").lower() == 'да'
+            self.print_policies()
+            name = input("Политика (Enter - задать параметры вручную): ").strip()
             
-            # ПРОДВИНУТОЕ ЗАДАНИЕ: Вопрос об исключении похожих символов
-            exclude_similar = input("Исключить похожие символы (0/O, l/I)? (да/нет): ").lower() == 'да'
+            if name:
+                policy = self.policies.get(name)
+                if not policy:
+                    print(f"Политика '{name}' не найдена.")
+                    return None
+            else:
+                policy = self.ask_policy_options()
+                policy_name = input("Сохранить как политику? Введите название (Enter - не сохранять): ").strip()
+                if policy_name:
+                    policy.name = policy_name
+                    self.db_manager.save_policy(policy)
+                    self.policies[policy_name] = policy
             
-            password = self.password_generator.generate(
-                length=length,
-                use_uppercase=use_uppercase,
-                use_lowercase=use_lowercase,
-                use_digits=use_digits,
-                use_special=use_special,
-                exclude_similar=exclude_similar  # ПРОДВИНУТОЕ ЗАДАНИЕ: Передаем новый параметр
-            )
+            password = self.password_generator.generate_by_policy(policy)
             
             print(f"\nСгенерированный пароль: {password}")
+            print(f"Оценка энтропии: {self.password_generator.entropy_bits(policy):.0f} бит")
             return password
             
         except ValueError as e:
             print(f"Ошибка: {e}")
             return None
     
+    def print_policies(self):
+        """Показать сохраненные политики генерации"""
+        print("Сохраненные политики:")
+        for policy in self.policies.values():
+            bits = self.password_generator.entropy_bits(policy)
+            print(f"  {policy.name:<25} {policy.describe()}, ~{bits:.0f} бит")
+    
+    def manage_policies(self):
+        """Просмотр и удаление политик генерации"""
+        print("\n--- Политики генерации ---")
+        self.print_policies()
+        name = input("Название политики для удаления (Enter - назад): ").strip()
+        if not name:
+            return
+        
+        if self.db_manager.delete_policy(name):
+            self.policies.pop(name, None)
+            print(f"Политика '{name}' удалена.")
+        else:
+            print(f"Политика '{name}' не найдена.")
+    
     def get_password(self):
         """Получить пароль по названию"""
         print("\n--- Получение пароля ---")
@@ -320,6 +729,9 @@ class PasswordManager:
         record = self.db_manager.get_password(name)
         if not record:
             print(f"Пароль для '{name}' не найден.")
+            suggestions = self.search_index.search(name, limit=5)
+            if suggestions:
+                print("Возможно, вы искали: " + ", ".join(f"{row[1]} ({row[2]})" for row in suggestions))
             return
         
         # Расшифровываем пароль
@@ -329,6 +741,45 @@ class PasswordManager:
         print(f"Логин: {record[2]}")
         print(f"Пароль: {decrypted_password}")
     
+    def change_password(self):
+        """Сменить пароль записи; прежний остается в истории"""
+        print("\n--- Смена пароля ---")
+        name = input("Введите название: ").strip()
+        
+        if not name:
+            print("Название не может быть пустым.")
+            return
+        if not self.db_manager.get_password(name):
+            print(f"Пароль для '{name}' не найден.")
+            return
+        
+        login = input("Новый логин (Enter - оставить прежний): ").strip() or None
+        password = self.generate_password_interactive()
+        if not password:
+            return
+        
+        self.db_manager.update_password(name, self.encryption_manager.encrypt(password), login=login)
+        print(f"\nПароль для '{name}' изменен. Прежних версий хранится: до {self.db_manager.history_limit}.")
+    
+    def show_password_history(self):
+        """Показать прежние пароли записи"""
+        print("\n--- История пароля ---")
+        name = input("Введите название: ").strip()
+        
+        if not name:
+            print("Название не может быть пустым.")
+            return
+        
+        history = self.db_manager.get_password_history(name)
+        if not history:
+            print(f"У '{name}' нет прежних паролей.")
+            return
+        
+        print(f"{'Заменен':<20} {'Пароль'}")
+        print("-" * 50)
+        for encrypted, replaced_time in history:
+            print(f"{replaced_time:<20} {self.encryption_manager.decrypt(encrypted)}")
+    
     def list_passwords(self):
         """Показать список всех паролей"""
         print("\n--- Список всех паролей ---")
@@ -344,6 +795,82 @@ class PasswordManager:
         for password in passwords:
             print(f"{password[0]:<5} {password[1]:<20} {password[2]:<20} {password[3]}")
     
+    def import_passwords(self):
+        """Импортировать пароли из CSV/JSON-экспорта браузера"""
+        print("\n--- Импорт паролей ---")
+        path = input("Путь к файлу CSV или JSON: ").strip()
+        
+        if not os.path.exists(path):
+            print(f"Файл '{path}' не найден.")
+            return
+        
+        from vault_io import VaultTransfer
+        
+        try:
+            transfer = VaultTransfer(self.db_manager, self.encryption_manager)
+            count = transfer.import_file(path)
+            print(f"Импортировано записей: {count}")
+        except ValueError as e:
+            print(f"Ошибка импорта: {e}")
+    
+    def export_backup(self):
+        """Экспортировать хранилище в зашифрованную резервную копию"""
+        print("\n--- Экспорт резервной копии ---")
+        path = input("Путь к файлу резервной копии: ").strip()
+        if not path:
+            print("Путь не может быть пустым.")
+            return
+        
+        passphrase = getpass.getpass("Пароль резервной копии: ")
+        if passphrase != getpass.getpass("Подтвердите пароль: "):
+            print("Пароли не совпадают.")
+            return
+        
+        from vault_io import VaultTransfer
+        
+        transfer = VaultTransfer(self.db_manager, self.encryption_manager)
+        count = transfer.export_backup(path, passphrase)
+        print(f"Экспортировано записей: {count}")
+    
+    def restore_backup(self):
+        """Восстановить записи из зашифрованной резервной копии"""
+        print("\n--- Восстановление из резервной копии ---")
+        path = input("Путь к файлу резервной копии: ").strip()
+        
+        if not os.path.exists(path):
+            print(f"Файл '{path}' не найден.")
+            return
+        
+        from vault_io import VaultTransfer
+        
+        passphrase = getpass.getpass("Пароль резервной копии: ")
+        try:
+            transfer = VaultTransfer(self.db_manager, self.encryption_manager)
+            count = transfer.import_backup(path, passphrase)
+            print(f"Восстановлено записей: {count}")
+        except ValueError as e:
+            print(f"Ошибка восстановления: {e}")
+    
+    def search_passwords(self):
+        """Поиск записей по названию, логину, тегам и адресу"""
+        print("\n--- Поиск ---")
+        query = input("Что ищем (например, 'github work'): ").strip()
+        
+        if not query:
+            print("Запрос не может быть пустым.")
+            return
+        
+        results = self.search_index.search(query)
+        if not results:
+            print("Ничего не найдено.")
+            return
+        
+        print(f"{'ID':<5} {'Название':<20} {'Логин':<20} {'Теги':<15} {'Адрес'}")
+        print("-" * 80)
+        
+        for entry_id, name, login, tags, url in results:
+            print(f"{entry_id:<5} {name:<20} {login:<20} {tags or '':<15} {url or ''}")
+    
     def delete_password(self):
         """Удалить пароль"""
         print("\n--- Удаление пароля ---")
@@ -358,6 +885,73 @@ class PasswordManager:
         else:
             print(f"Пароль '{name}' не найден.")
     
+    def audit_vault(self):
+        """Проверить хранилище на повторные и утекшие пароли"""
+        print("\n--- Проверка хранилища ---")
+        corpus_path = input("Файл утечек в формате HIBP (Enter - пропустить): ").strip() or None
+        
+        if corpus_path and not os.path.exists(corpus_path):
+            print(f"Файл '{corpus_path}' не найден.")
+            return
+        
+        from vault_audit import VaultAuditor
+        
+        auditor = VaultAuditor(self.db_manager, self.encryption_manager)
+        report = auditor.audit(corpus_path)
+        
+        print(f"Проверено записей: {report.checked}")
+        for group in report.reused:
+            names = ", ".join(f"{name} ({login})" for _, name, login in group)
+            print(f"Повторяющийся пароль: {names}")
+        for _, name, login, count in report.breached:
+            print(f"Пароль найден в утечках ({count} раз): {name} ({login})")
+        
+        if not report.has_problems():
+            print("Проблем не найдено.")
+    
+    def sync_vault(self):
+        """Синхронизировать хранилище с другой копией (файл базы с тем же ключом .key)"""
+        print("\n--- Синхронизация ---")
+        path = input("Путь к другой копии хранилища (passwords.db): ").strip()
+        
+        if not path:
+            print("Путь не может быть пустым.")
+            return
+        if not os.path.exists(path):
+            print(f"Файл '{path}' не найден.")
+            return
+        if os.path.abspath(path) == os.path.abspath(self.db_manager.db_name):
+            print("Это то же самое хранилище.")
+            return
+        
+        from sync_transport import LocalTransport
+        from vault_sync import VaultReplica, VaultSync
+        
+        remote = LocalTransport(VaultReplica(DatabaseManager(path)))
+        report = VaultSync(VaultReplica(self.db_manager), remote).sync()
+        
+        if report.rekeyed:
+            print("Хранилище было скопировано с другой копии: оно получило новый идентификатор, записи сверены по содержимому.")
+        print(f"Получено записей: {report.pulled}, отправлено: {report.pushed}, конфликтов: {report.conflicts}")
+        print(f"Сравнено хэшей: {report.hashes_exchanged}, передано: {report.bytes_transferred} байт")
+    
+    def open_browser(self):
+        """Открыть окно просмотра хранилища"""
+        try:
+            import tkinter
+            from vault_gui import VaultBrowser
+        except ImportError as e:
+            print(f"Графический интерфейс недоступен: {e}")
+            return
+        try:
+            browser = VaultBrowser(self.db_manager, self.encryption_manager)
+        except tkinter.TclError as e:
+            # Нет дисплея (например, сеанс SSH)
+            print(f"Не удалось открыть окно: {e}")
+            return
+        browser.run()
+        print(f"Окно закрыто. Расшифровано паролей: {browser.decryptions}")
+    
     def show_menu(self):
         """Показать главное меню"""
         while True:
@@ -369,6 +963,16 @@ class PasswordManager:
             print("3. Список всех паролей")
             print("4. Удалить пароль")
             print("5. Создать новый пароль")
+            print("6. Импорт паролей (CSV/JSON)")
+            print("7. Экспорт резервной копии")
+            print("8. Восстановить из резервной копии")
+            print("9. Политики генерации")
+            print("10. Проверка хранилища")
+            print("11. Поиск")
+            print("12. Синхронизация с другой копией")
+            print("13. Сменить пароль")
+            print("14. История пароля")
+            print("15. Открыть окно хранилища")
             print("0. Выход")
             print("="*50)
             
@@ -384,6 +988,26 @@ class PasswordManager:
                 self.delete_password()
             elif choice == "5":
                 self.generate_password_interactive()
+            elif choice == "6":
+                self.import_passwords()
+            elif choice == "7":
+                self.export_backup()
+            elif choice == "8":
+                self.restore_backup()
+            elif choice == "9":
+                self.manage_policies()
+            elif choice == "10":
+                self.audit_vault()
+            elif choice == "11":
+                self.search_passwords()
+            elif choice == "12":
+                self.sync_vault()
+            elif choice == "13":
+                self.change_password()
+            elif choice == "14":
+                self.show_password_history()
+            elif choice == "15":
+                self.open_browser()
             elif choice == "0":
                 print("До свидания!")
                 break
@@ -397,7 +1021,12 @@ def main():
     
     manager = PasswordManager()
     
+    # База нужна для аутентификации в любом случае; остальные компоненты - по требованию
+    manager.db_manager
+    profiler.report()
+    
     if manager.authenticate():
+        manager.upgrade_storage()
         manager.show_menu()
     else:
         print("Ошибка аутентификации.")
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+Синхронизация копий базы напоминаний по журналу изменений
+
+Каждая копия дописывает свои изменения в reminder_changes (см. database.py).
+При синхронизации передаются только изменения после курсора - последнего
+полученного от этой копии seq. Конфликт правок одной записи решается
+одинаково на всех копиях: побеждает изменение с большим (lamport, origin).
+
+Запуск:
+    python reminder_sync.py путь/к/другой/reminders.db
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+from database import SYNC_COLUMNS, ReminderDatabase
+from sync_transport import LocalTransport
+
+# Сколько изменений передается за один запрос
+BATCH_SIZE = 500
+
+
+class ReminderReplica:
+    """Копия базы напоминаний: выдача журнала после курсора и применение чужих изменений"""
+
+    def __init__(self, database):
+        self.database = database
+        with self._connect() as conn:
+            self.replica_id = conn.execute("SELECT value FROM reminder_sync_meta WHERE key = 'replica_id'").fetchone()[0]
+
+    def _connect(self):
+        return sqlite3.connect(self.database.db_name, timeout=30)
+
+    def identity(self, _argument=None):
+        return self.replica_id
+
+    def cursor(self, peer_id):
+        """До какого seq копии peer_id изменения уже применены здесь"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT pulled_seq FROM reminder_sync_peers WHERE peer_id = ?', (peer_id,)).fetchone()
+            return row[0] if row else 0
+
+    def set_cursor(self, request):
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT INTO reminder_sync_peers (peer_id, pulled_seq) VALUES (?, ?)
+                ON CONFLICT(peer_id) DO UPDATE SET pulled_seq = MAX(pulled_seq, excluded.pulled_seq)
+            ''', (request['peer'], request['seq']))
+            conn.commit()
+
+    def changes_since(self, request):
+        """Изменения с seq больше request['seq'], кроме пришедших от самой запрашивающей копии
+
+        Из нескольких изменений одной записи в пакете передается только последнее.
+        """
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT seq, uid, op, row, lamport, origin, updated_at FROM reminder_changes
+                WHERE seq > ? ORDER BY seq LIMIT ?
+            ''', (request['seq'], request.get('limit', BATCH_SIZE))).fetchall()
+        latest = {}
+        for seq, uid, op, row, lamport, origin, updated_at in rows:
+            if origin == request.get('exclude_origin'):
+                continue
+            latest.pop(uid, None)
+            latest[uid] = {'uid': uid, 'op': op, 'row': json.loads(row) if row else None,
+                           'lamport': lamport, 'origin': origin, 'updated_at': updated_at}
+        return {
+            'changes': list(latest.values()),
+            'last_seq': rows[-1][0] if rows else request['seq'],
+            'more': len(rows) == request.get('limit', BATCH_SIZE),
+        }
+
+    def apply(self, changes):
+        """Применить изменения другой копии; вернуть (применено, устарело)"""
+        applied = stale = 0
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            # Пока флаг стоит, триггеры не пишут применяемые изменения в журнал как свои
+            cursor.execute("INSERT OR REPLACE INTO reminder_sync_meta (key, value) VALUES ('applying', '1')")
+            for change in changes:
+                current = cursor.execute('''
+                    SELECT lamport, origin FROM reminder_changes WHERE uid = ?
+                    ORDER BY lamport DESC, origin DESC LIMIT 1
+                ''', (change['uid'],)).fetchone()
+                if current is not None and (change['lamport'], change['origin']) <= tuple(current):
+                    stale += 1
+                    continue
+
+                if change['op'] == 'delete':
+                    cursor.execute('DELETE FROM reminders WHERE uid = ?', (change['uid'],))
+                else:
+                    self._upsert(cursor, change)
+                cursor.execute('''
+                    INSERT INTO reminder_changes (uid, op, row, lamport, origin, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (change['uid'], change['op'], json.dumps(change['row'], ensure_ascii=False) if change['row'] else None,
+                      change['lamport'], change['origin'], change['updated_at']))
+                cursor.execute('UPDATE reminders SET change_seq = ? WHERE uid = ?', (cursor.lastrowid, change['uid']))
+                applied += 1
+            cursor.execute("DELETE FROM reminder_sync_meta WHERE key = 'applying'")
+            conn.commit()
+        return applied, stale
+
+    @staticmethod
+    def _upsert(cursor, change):
+        row = change['row']
+        values = [row[column] for column in SYNC_COLUMNS]
+        assignments = ', '.join(f'{column} = ?' for column in SYNC_COLUMNS)
+        # Если сменилось время срабатывания, напоминание снова должно быть показано здесь
+        cursor.execute(f'''
+            UPDATE reminders SET {assignments}, updated_at = ?,
+                claimed_by = CASE WHEN due_time IS ? THEN claimed_by END,
+                claimed_at = CASE WHEN due_time IS ? THEN claimed_at END
+            WHERE uid = ?
+        ''', values + [change['updated_at'], row['due_time'], row['due_time'], change['uid']])
+        if cursor.rowcount == 0:
+            cursor.execute(f'''
+                INSERT INTO reminders ({', '.join(SYNC_COLUMNS)}, uid, updated_at)
+                VALUES ({', '.join('?' * (len(SYNC_COLUMNS) + 2))})
+            ''', values + [change['uid'], change['updated_at']])
+
+
+class ReminderSyncReport:
+    """Итоги синхронизации"""
+
+    def __init__(self):
+        self.pulled = 0
+        self.pushed = 0
+        self.stale = 0
+        self.requests = 0
+        self.bytes_transferred = 0
+
+
+class ReminderSync:
+    """Двусторонняя синхронизация местной копии с удаленной через транспорт"""
+
+    def __init__(self, local, transport, batch_size=BATCH_SIZE):
+        self.local = local
+        self.transport = transport
+        self.batch_size = batch_size
+
+    def _pull(self, remote_id, report):
+        """Забрать изменения удаленной копии после нашего курсора"""
+        seq = self.local.cursor(remote_id)
+        while True:
+            batch = self.transport.call('changes_since', {'seq': seq, 'exclude_origin': self.local.replica_id,
+                                                          'limit': self.batch_size})
+            applied, stale = self.local.apply(batch['changes'])
+            report.pulled += applied
+            report.stale += stale
+            seq = batch['last_seq']
+            self.local.set_cursor({'peer': remote_id, 'seq': seq})
+            if not batch['more']:
+                return
+
+    def _push(self, remote_id, report):
+        """Отправить местные изменения после курсора удаленной копии"""
+        seq = self.transport.call('cursor', self.local.replica_id)
+        while True:
+            batch = self.local.changes_since({'seq': seq, 'exclude_origin': remote_id, 'limit': self.batch_size})
+            if batch['changes']:
+                applied, stale = self.transport.call('apply', batch['changes'])
+                report.pushed += applied
+                report.stale += stale
+            seq = batch['last_seq']
+            self.transport.call('set_cursor', {'peer': self.local.replica_id, 'seq': seq})
+            if not batch['more']:
+                return
+
+    def sync(self):
+        """Выполнить синхронизацию; вернуть ReminderSyncReport"""
+        report = ReminderSyncReport()
+        start_requests, start_bytes = self.transport.requests, self.transport.bytes_sent + self.transport.bytes_received
+
+        remote_id = self.transport.call('identity', None)
+        if remote_id == self.local.replica_id:
+            raise ValueError("Это та же самая копия базы")
+        self._pull(remote_id, report)
+        self._push(remote_id, report)
+
+        report.requests = self.transport.requests - start_requests
+        report.bytes_transferred = self.transport.bytes_sent + self.transport.bytes_received - start_bytes
+        return report
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Использование: python reminder_sync.py путь/к/другой/reminders.db")
+        raise SystemExit(1)
+    path = sys.argv[1]
+    if not os.path.exists(path):
+        print(f"Файл '{path}' не найден.")
+        raise SystemExit(1)
+
+    local = ReminderReplica(ReminderDatabase())
+    remote = LocalTransport(ReminderReplica(ReminderDatabase(path)))
+    try:
+        report = ReminderSync(local, remote).sync()
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        raise SystemExit(1)
+    print(f"Получено изменений: {report.pulled}, отправлено: {report.pushed}, устаревших: {report.stale}")
+    print(f"Запросов: {report.requests}, передано: {report.bytes_transferred} байт")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+Замер времени запуска: импорт модулей и инициализация компонентов
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_FLAG = '--profile-startup'
+
+
+class StartupProfiler:
+    """Собирает длительности этапов запуска; при выключенном профилировании почти ничего не стоит"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last_mark = self.started
+        self.records = []
+
+    def mark(self, name):
+        """Записать этап, длившийся с предыдущей отметки"""
+        now = time.perf_counter()
+        if self.enabled:
+            self.records.append((name, now - self.last_mark))
+        self.last_mark = now
+
+    @contextmanager
+    def phase(self, name):
+        """Замерить блок кода как отдельный этап"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            if self.enabled:
+                self.records.append((name, now - start))
+            self.last_mark = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self, title="Профиль запуска"):
+        """Напечатать разбивку времени запуска"""
+        if not self.enabled:
+            return
+        print(f"\n--- {title} ---")
+        for name, duration in self.records:
+            print(f"{name:<40} {duration * 1000:>9.1f} мс")
+        print(f"{'Итого':<40} {self.elapsed() * 1000:>9.1f} мс\n")
+
+
+# Общий профилировщик процесса; включается флагом --profile-startup
+profiler = StartupProfiler(enabled=PROFILE_FLAG in sys.argv)
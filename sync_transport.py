@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""
+Транспорт для синхронизации копий (хранилища паролей и базы напоминаний)
+"""
+
+import json
+
+
+class LocalTransport:
+    """Транспорт к копии в том же процессе; сериализует запросы в JSON, как по сети, и считает байты"""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def call(self, method, argument):
+        request = json.dumps(argument, ensure_ascii=False).encode()
+        self.requests += 1
+        self.bytes_sent += len(request)
+        result = getattr(self.replica, method)(json.loads(request))
+        response = json.dumps(result, ensure_ascii=False).encode()
+        self.bytes_received += len(response)
+        return json.loads(response)
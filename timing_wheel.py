@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Иерархическое колесо таймеров для коротких таймеров (отложенные уведомления, повторы)
+"""
+
+import itertools
+import threading
+from datetime import timedelta
+
+
+class Timer:
+    """Таймер в колесе; хранит свое текущее положение для отмены за O(1)"""
+
+    __slots__ = ('id', 'expires', 'payload', 'bucket')
+
+    def __init__(self, timer_id, expires, payload):
+        self.id = timer_id
+        self.expires = expires   # номер тика срабатывания
+        self.payload = payload
+        self.bucket = None       # словарь-ячейка, в которой сейчас лежит таймер
+
+    def active(self):
+        return self.bucket is not None
+
+
+class TimingWheel:
+    """Иерархическое колесо таймеров (Varghese & Lauck)
+
+    Уровень i состоит из slots ячеек по slots**i тиков. Добавление и отмена - O(1),
+    продвижение на один тик - O(1) плюс перенос таймеров из ячейки верхнего уровня
+    на нижние, когда до их срабатывания остается меньше одного оборота.
+    """
+
+    def __init__(self, start, tick=timedelta(seconds=1), slots=64, levels=4):
+        self.origin = start
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = 0
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        self.count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _tick_of(self, moment):
+        """Номер тика, не раньше которого наступает moment"""
+        ticks, remainder = divmod(moment - self.origin, self.tick)
+        return ticks + (1 if remainder else 0)
+
+    def _place(self, timer):
+        delta = max(timer.expires - self.current, 0)
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots:
+                bucket = self.wheels[level][(timer.expires // span) % self.slots]
+                break
+            span *= self.slots
+        else:
+            bucket = self.overflow
+        bucket[timer.id] = timer
+        timer.bucket = bucket
+
+    def schedule(self, when, payload):
+        """Запланировать payload на момент when; вернуть таймер для отмены"""
+        with self._lock:
+            timer = Timer(next(self._ids), max(self._tick_of(when), self.current + 1), payload)
+            self._place(timer)
+            self.count += 1
+            return timer
+
+    def cancel(self, timer):
+        """Отменить таймер; False, если он уже сработал или отменен"""
+        with self._lock:
+            if timer.bucket is None:
+                return False
+            del timer.bucket[timer.id]
+            timer.bucket = None
+            self.count -= 1
+            return True
+
+    def next_expiry(self):
+        """Момент срабатывания ближайшего таймера или None (перебор всех ячеек, для симуляции)"""
+        with self._lock:
+            if self.count == 0:
+                return None
+            ticks = [timer.expires for wheel in self.wheels for bucket in wheel for timer in bucket.values()]
+            ticks.extend(timer.expires for timer in self.overflow.values())
+        return self.origin + self.tick * min(ticks)
+
+    def _cascade(self):
+        """Перенести таймеры верхних уровней, чей оборот начался на текущем тике"""
+        span = 1
+        for level in range(1, self.levels):
+            span *= self.slots
+            if self.current % span:
+                return
+            bucket = self.wheels[level][(self.current // span) % self.slots]
+            timers = list(bucket.values())
+            bucket.clear()
+            for timer in timers:
+                self._place(timer)
+
+        # Полный оборот старшего уровня: пересмотреть таймеры за его пределами
+        timers = list(self.overflow.values())
+        self.overflow.clear()
+        for timer in timers:
+            self._place(timer)
+
+    def advance(self, now):
+        """Продвинуть колесо до момента now; вернуть payload сработавших таймеров по порядку"""
+        target = (now - self.origin) // self.tick
+        expired = []
+        with self._lock:
+            while self.current < target:
+                if self.count == 0:
+                    # Пустое колесо можно перевести сразу
+                    self.current = target
+                    break
+                self.current += 1
+                self._cascade()
+                bucket = self.wheels[0][self.current % self.slots]
+                if bucket:
+                    for timer in sorted(bucket.values(), key=lambda t: t.id):
+                        timer.bucket = None
+                        expired.append(timer.payload)
+                    self.count -= len(bucket)
+                    bucket.clear()
+        return expired
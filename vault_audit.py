@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Проверка хранилища паролей: повторно используемые и утекшие пароли
+"""
+
+import hashlib
+import hmac
+import mmap
+import os
+
+from vault_io import pipelined
+
+SHA1_HEX_LENGTH = 40
+
+# Окно, которое проще просмотреть построчно, чем продолжать поиск делением
+LINEAR_SCAN_WINDOW = 4096
+
+
+class BreachCorpus:
+    """Локальная база утекших паролей в формате HIBP (SHA1:COUNT, строки отсортированы по хэшу)
+
+    Файл отображается в память и не загружается в RAM целиком. Поиск - интерполяционный
+    (SHA-1 распределены равномерно), чередующийся с делением пополам для гарантии O(log n).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def close(self):
+        if self.size:
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _line_start(self, offset):
+        """Начало первой строки, начинающейся не раньше offset"""
+        if offset <= 0:
+            return 0
+        newline = self._data.find(b'\n', offset - 1)
+        return self.size if newline == -1 else newline + 1
+
+    def _parse_line(self, start):
+        """Разобрать строку: (хэш, количество утечек, начало следующей строки)"""
+        end = self._data.find(b'\n', start)
+        if end == -1:
+            end = self.size
+        line = self._data[start:end].strip()
+        digest, _, count = line.partition(b':')
+        return digest.upper(), int(count) if count.strip() else 1, end + 1
+
+    def lookup(self, sha1_hex):
+        """Количество утечек пароля с данным SHA-1 (0, если не найден)"""
+        target = sha1_hex.upper().encode('ascii')
+        target_value = int(target[:8], 16)
+
+        lo, hi = 0, self.size
+        lo_value, hi_value = 0, 16 ** 8
+        step = 0
+        while hi - lo > LINEAR_SCAN_WINDOW:
+            step += 1
+            if step % 2 and hi_value > lo_value:
+                fraction = (target_value - lo_value) / (hi_value - lo_value)
+                probe = lo + int(fraction * (hi - lo))
+            else:
+                probe = (lo + hi) // 2
+            probe = min(max(probe, lo + 1), hi - 1)
+
+            start = self._line_start(probe)
+            if start >= hi:
+                hi = probe
+                continue
+
+            digest, count, _ = self._parse_line(start)
+            if digest == target:
+                return count
+            if digest < target:
+                lo, lo_value = start, int(digest[:8], 16)
+            else:
+                hi, hi_value = start, int(digest[:8], 16)
+
+        start = lo
+        while start < hi:
+            digest, count, start = self._parse_line(start)
+            if digest == target:
+                return count
+            if digest > target:
+                break
+        return 0
+
+
+class AuditReport:
+    """Результат проверки хранилища"""
+
+    def __init__(self):
+        self.checked = 0
+        self.reused = []      # группы записей [(id, name, login), ...] с одинаковым паролем
+        self.breached = []    # записи (id, name, login, количество утечек)
+
+    def has_problems(self):
+        return bool(self.reused or self.breached)
+
+
+class VaultAuditor:
+    """Потоковая проверка хранилища без хранения расшифрованных паролей"""
+
+    def __init__(self, db_manager, encryption_manager, chunk_size=500, workers=None):
+        self.db_manager = db_manager
+        self.encryption_manager = encryption_manager
+        self.chunk_size = chunk_size
+        self.workers = workers or min(8, os.cpu_count() or 1)
+
+    def audit(self, corpus_path=None):
+        """Проверить все записи; corpus_path - файл утечек в формате HIBP (необязательно)"""
+        # Случайный ключ живет только во время проверки: отпечатки нельзя перебрать по словарю
+        fingerprint_key = os.urandom(32)
+        decrypt = self.encryption_manager.decrypt
+
+        def fingerprint_chunk(rows):
+            result = []
+            for entry_id, name, login, encrypted, _, _ in rows:
+                password = decrypt(encrypted).encode()
+                fingerprint = hmac.new(fingerprint_key, password, hashlib.sha256).digest()
+                sha1 = hashlib.sha1(password).hexdigest()
+                result.append((entry_id, name, login, fingerprint, sha1))
+            return result
+
+        report = AuditReport()
+        by_fingerprint = {}
+        corpus = BreachCorpus(corpus_path) if corpus_path else None
+        try:
+            chunks = self.db_manager.iter_passwords(self.chunk_size)
+            for entries in pipelined(fingerprint_chunk, chunks, self.workers):
+                for entry_id, name, login, fingerprint, sha1 in entries:
+                    report.checked += 1
+                    by_fingerprint.setdefault(fingerprint, []).append((entry_id, name, login))
+                    if corpus:
+                        count = corpus.lookup(sha1)
+                        if count:
+                            report.breached.append((entry_id, name, login, count))
+        finally:
+            if corpus:
+                corpus.close()
+
+        report.reused = [group for group in by_fingerprint.values() if len(group) > 1]
+        return report
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+Окно просмотра хранилища паролей
+
+Список строится только из метаданных (название, логин, дата) и показывается
+страницами, поэтому открытие большого хранилища не расшифровывает ни одного
+пароля. Пароль расшифровывается, только когда его показывают или копируют;
+скопированный пароль удаляется из буфера обмена через CLIPBOARD_CLEAR_MS.
+
+Запуск:
+    python vault_gui.py
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
+
+# Строк на странице списка
+PAGE_SIZE = 200
+
+# Через сколько очистить буфер обмена после копирования пароля (мс)
+CLIPBOARD_CLEAR_MS = 20000
+
+# Через сколько скрыть показанный пароль (мс)
+REVEAL_HIDE_MS = 15000
+
+
+class VaultBrowser:
+    def __init__(self, db_manager, encryption_manager, page_size=PAGE_SIZE):
+        self.db_manager = db_manager
+        self.encryption_manager = encryption_manager
+        self.page_size = page_size
+        self.entries = []   # (id, name, login, created_time) всех записей
+        self.filtered = []  # Записи, подходящие под фильтр
+        self.page = 0
+        self.decryptions = 0
+        self._clipboard_value = None
+        self._clipboard_job = None
+        self._reveal_job = None
+
+        self.root = tk.Tk()
+        self.root.title("Хранилище паролей")
+        self.root.geometry("700x550")
+        self.root.resizable(True, True)
+
+        self.setup_ui()
+        self.root.after_idle(self.load_entries)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def setup_ui(self):
+        """Настройка пользовательского интерфейса"""
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+
+        ttk.Label(main_frame, text="Хранилище паролей", font=("Arial", 16, "bold")).grid(row=0, column=0, pady=(0, 10))
+
+        # Фильтр по названию и логину
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.grid(row=1, column=0, sticky="ew", pady=(0, 10))
+        ttk.Label(filter_frame, text="Фильтр:").pack(side="left", padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.apply_filter())
+        ttk.Entry(filter_frame, textvariable=self.filter_var).pack(side="left", fill="x", expand=True)
+        ttk.Button(filter_frame, text="Обновить", command=self.load_entries).pack(side="left", padx=(5, 0))
+
+        # Список записей текущей страницы
+        list_frame = ttk.Frame(main_frame)
+        list_frame.grid(row=2, column=0, sticky="nsew")
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(list_frame, columns=("name", "login", "created"), show="headings", height=15)
+        self.tree.heading("name", text="Название")
+        self.tree.heading("login", text="Логин")
+        self.tree.heading("created", text="Создано")
+        self.tree.column("name", width=250)
+        self.tree.column("login", width=200)
+        self.tree.column("created", width=150)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.tree.bind("<<TreeviewSelect>>", lambda event: self.hide_password())
+        self.tree.bind("<Double-1>", lambda event: self.reveal_password())
+        self.tree.bind("<Control-c>", lambda event: self.copy_password())
+
+        # Переключение страниц
+        page_frame = ttk.Frame(main_frame)
+        page_frame.grid(row=3, column=0, sticky="ew", pady=(5, 0))
+        ttk.Button(page_frame, text="◀", width=3, command=lambda: self.show_page(self.page - 1)).pack(side="left")
+        self.page_var = tk.StringVar()
+        ttk.Label(page_frame, textvariable=self.page_var).pack(side="left", padx=10)
+        ttk.Button(page_frame, text="▶", width=3, command=lambda: self.show_page(self.page + 1)).pack(side="left")
+
+        # Действия с выбранной записью
+        action_frame = ttk.Frame(main_frame)
+        action_frame.grid(row=4, column=0, sticky="ew", pady=(10, 0))
+        ttk.Button(action_frame, text="Показать пароль", command=self.reveal_password).pack(side="left", padx=(0, 5))
+        ttk.Button(action_frame, text="Копировать пароль", command=self.copy_password).pack(side="left", padx=5)
+
+        self.secret_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.secret_var, font=("Courier", 12)).grid(row=5, column=0, sticky="w",
+                                                                                      pady=(10, 0))
+
+        self.status_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.status_var, relief="sunken").grid(row=6, column=0, sticky="ew",
+                                                                                  pady=(10, 0))
+
+    def load_entries(self):
+        """Прочитать метаданные всех записей (без шифртекстов) и показать первую страницу"""
+        self.entries = self.db_manager.list_passwords()
+        self.apply_filter()
+
+    def apply_filter(self):
+        """Оставить записи, у которых название или логин содержат текст фильтра"""
+        text = self.filter_var.get().strip().lower()
+        if text:
+            self.filtered = [entry for entry in self.entries if text in entry[1].lower() or text in entry[2].lower()]
+        else:
+            self.filtered = self.entries
+        self.show_page(0)
+
+    def page_count(self):
+        return max(1, -(-len(self.filtered) // self.page_size))
+
+    def show_page(self, page):
+        """Показать одну страницу: в Treeview всегда не больше page_size строк"""
+        self.page = min(max(page, 0), self.page_count() - 1)
+        self.hide_password()
+        self.tree.delete(*self.tree.get_children())
+        start = self.page * self.page_size
+        for entry_id, name, login, created_time in self.filtered[start:start + self.page_size]:
+            self.tree.insert("", "end", iid=str(entry_id), values=(name, login, created_time))
+        self.page_var.set(f"Страница {self.page + 1} из {self.page_count()}")
+        self.status_var.set(f"Записей: {len(self.filtered)} из {len(self.entries)}")
+
+    def _selected_password(self):
+        """Расшифровать пароль выбранной записи (None, если ничего не выбрано)"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Предупреждение", "Выберите запись!")
+            return None
+        encrypted = self.db_manager.get_encrypted_password(int(selection[0]))
+        if encrypted is None:
+            messagebox.showerror("Ошибка", "Запись не найдена, обновите список.")
+            return None
+        self.decryptions += 1
+        return self.encryption_manager.decrypt(encrypted)
+
+    def reveal_password(self):
+        """Показать пароль выбранной записи на REVEAL_HIDE_MS"""
+        password = self._selected_password()
+        if password is None:
+            return
+        self.secret_var.set(f"Пароль: {password}")
+        if self._reveal_job:
+            self.root.after_cancel(self._reveal_job)
+        self._reveal_job = self.root.after(REVEAL_HIDE_MS, self.hide_password)
+
+    def hide_password(self):
+        if self._reveal_job:
+            self.root.after_cancel(self._reveal_job)
+            self._reveal_job = None
+        self.secret_var.set("")
+
+    def copy_password(self):
+        """Скопировать пароль выбранной записи в буфер обмена с автоочисткой"""
+        password = self._selected_password()
+        if password is None:
+            return
+        self.root.clipboard_clear()
+        self.root.clipboard_append(password)
+        self._clipboard_value = password
+        if self._clipboard_job:
+            self.root.after_cancel(self._clipboard_job)
+        self._clipboard_job = self.root.after(CLIPBOARD_CLEAR_MS, self.clear_clipboard)
+        self.status_var.set(f"Пароль скопирован, буфер обмена очистится через {CLIPBOARD_CLEAR_MS // 1000} с")
+
+    def clear_clipboard(self):
+        """Очистить буфер обмена, если в нем все еще наш пароль"""
+        self._clipboard_job = None
+        if self._clipboard_value is None:
+            return
+        try:
+            if self.root.clipboard_get() == self._clipboard_value:
+                self.root.clipboard_clear()
+                self.root.clipboard_append("")
+        except tk.TclError:
+            pass  # Буфер пуст или содержит не текст
+        self._clipboard_value = None
+        self.status_var.set("Буфер обмена очищен")
+
+    def on_closing(self):
+        """Закрытие окна: скопированный пароль не должен пережить приложение"""
+        if self._clipboard_job:
+            self.root.after_cancel(self._clipboard_job)
+        self.clear_clipboard()
+        self.root.update()  # Дать менеджеру буфера обмена забрать пустое значение
+        self.root.destroy()
+
+    def run(self):
+        """Запуск приложения"""
+        self.root.mainloop()
+
+
+def main():
+    """Открыть хранилище после проверки мастер-пароля"""
+    from password_manager import DatabaseManager, EncryptionManager
+
+    db_manager = DatabaseManager()
+    if not db_manager.get_master_password():
+        print("Мастер-пароль не установлен. Сначала запустите password_manager.py.")
+        return
+
+    prompt = tk.Tk()
+    prompt.withdraw()
+    for _ in range(3):
+        password = simpledialog.askstring("Хранилище паролей", "Мастер-пароль:", show="*", parent=prompt)
+        if password is None:
+            prompt.destroy()
+            return
+        if db_manager.verify_master_password(password):
+            break
+        messagebox.showerror("Ошибка", "Неверный мастер-пароль!", parent=prompt)
+    else:
+        prompt.destroy()
+        return
+    prompt.destroy()
+
+    VaultBrowser(db_manager, EncryptionManager()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+"""
+Потоковый импорт/экспорт хранилища паролей
+"""
+
+import base64
+import csv
+import json
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+BACKUP_MAGIC = b'VPAB\x01'
+BACKUP_SALT_SIZE = 16
+BACKUP_ITERATIONS = 390000
+
+# Возможные названия колонок в экспортах браузеров и менеджеров паролей
+NAME_FIELDS = ('name', 'title', 'origin')
+LOGIN_FIELDS = ('username', 'login', 'login_username', 'user', 'email')
+PASSWORD_FIELDS = ('password', 'login_password', 'pass')
+URL_FIELDS = ('url', 'login_uri', 'uri', 'hostname', 'website')
+
+
+def chunked(iterable, size):
+    """Разбить поток на списки по size элементов"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pipelined(func, chunks, workers):
+    """Обработать пачки в пуле потоков, сохраняя порядок и ограничивая число пачек в работе"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _first_value(record, fields):
+    """Вернуть первое непустое значение из перечисленных полей"""
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return str(value).strip()
+    return ''
+
+
+def _host_from_url(url):
+    """Получить имя хоста из URL для использования в качестве названия"""
+    host = url.split('://', 1)[-1].split('/', 1)[0]
+    return host.split('@')[-1] or url
+
+
+def normalize_record(record):
+    """Привести запись экспорта к виду (name, login, password, url, tags) или None"""
+    # Формат Bitwarden JSON: данные входа лежат во вложенном объекте login
+    login_data = record.get('login')
+    if isinstance(login_data, dict):
+        flat = {key: value for key, value in login_data.items() if not isinstance(value, (dict, list))}
+        uris = login_data.get('uris') or []
+        if uris and isinstance(uris[0], dict):
+            flat['url'] = uris[0].get('uri')
+        flat['name'] = record.get('name')
+        record = flat
+    else:
+        record = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+
+    password = _first_value(record, PASSWORD_FIELDS)
+    if not password:
+        return None
+
+    url = _first_value(record, URL_FIELDS)
+    name = _first_value(record, NAME_FIELDS)
+    if not name:
+        name = _host_from_url(url) if url else 'Без названия'
+
+    return name, _first_value(record, LOGIN_FIELDS), password, url, ''
+
+
+def iter_csv_records(path):
+    """Построчно прочитать CSV-экспорт браузера"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+def iter_json_records(path, buffer_size=65536):
+    """Потоково прочитать JSON-экспорт: массив записей или объект с ключом items"""
+    decoder = json.JSONDecoder()
+
+    with open(path, encoding='utf-8-sig') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            data = f.read(buffer_size)
+            if not data:
+                eof = True
+            buffer = buffer[pos:] + data
+            pos = 0
+
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos] if pos < len(buffer) else ''
+                fill()
+
+        def decode():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise ValueError("Некорректный JSON-файл импорта.")
+                    fill()
+                    continue
+                # Число на границе буфера может быть прочитано не полностью
+                if end == len(buffer) and not eof:
+                    fill()
+                    continue
+                pos = end
+                return value
+
+        def expect(char):
+            nonlocal pos
+            if peek() != char:
+                raise ValueError(f"Некорректный JSON-файл импорта: ожидался '{char}'.")
+            pos += 1
+
+        def iter_array():
+            nonlocal pos
+            expect('[')
+            if peek() == ']':
+                pos += 1
+                return
+            while True:
+                value = decode()
+                if isinstance(value, dict):
+                    yield value
+                if peek() == ',':
+                    pos += 1
+                    continue
+                expect(']')
+                return
+
+        fill()
+        if peek() == '[':
+            yield from iter_array()
+            return
+
+        expect('{')
+        if peek() == '}':
+            return
+        while True:
+            key = decode()
+            expect(':')
+            if key == 'items' and peek() == '[':
+                yield from iter_array()
+            else:
+                decode()
+            if peek() == ',':
+                pos += 1
+                continue
+            expect('}')
+            return
+
+
+def _derive_backup_cipher(passphrase, salt, iterations):
+    """Получить шифр резервной копии из пароля"""
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(passphrase.encode())))
+
+
+class VaultTransfer:
+    """Пакетный импорт и экспорт хранилища с шифрованием в пуле потоков"""
+
+    def __init__(self, db_manager, encryption_manager, chunk_size=500, workers=None):
+        self.db_manager = db_manager
+        self.encryption_manager = encryption_manager
+        self.chunk_size = chunk_size
+        self.workers = workers or min(8, os.cpu_count() or 1)
+
+    def _encrypt_chunk(self, records):
+        """Зашифровать пароли пачки записей (name, login, password[, url, tags])"""
+        encrypt = self.encryption_manager.encrypt
+        rows = []
+        for name, login, password, *extra in records:
+            # В резервных копиях старого формата адреса и тегов нет
+            url, tags = (*extra, '', '')[:2]
+            rows.append((name, login, encrypt(password), url or '', tags or ''))
+        return rows
+
+    def _decrypt_chunk(self, rows):
+        """Расшифровать пароли пачки строк базы данных"""
+        decrypt = self.encryption_manager.decrypt
+        return [(name, login, decrypt(encrypted), url or '', tags or '')
+                for _, name, login, encrypted, url, tags in rows]
+
+    def import_records(self, records):
+        """Импортировать поток записей (name, login, password[, url, tags]), вернуть их количество"""
+        chunks = chunked(records, self.chunk_size)
+        imported = 0
+        for rows in pipelined(self._encrypt_chunk, chunks, self.workers):
+            self.db_manager.add_passwords_bulk(rows)
+            imported += len(rows)
+        return imported
+
+    def migrate_storage(self):
+        """Перешифровать записи старого формата в двоичный, пачками; вернуть их количество"""
+        decrypt = self.encryption_manager.decrypt
+        encrypt = self.encryption_manager.encrypt
+
+        def convert_chunk(rows):
+            return [(entry_id, encrypt(decrypt(encrypted))) for entry_id, _, _, encrypted in rows]
+
+        migrated = 0
+        chunks = self.db_manager.iter_legacy_passwords(self.chunk_size)
+        for rows in pipelined(convert_chunk, chunks, self.workers):
+            self.db_manager.update_ciphertexts(rows)
+            migrated += len(rows)
+        return migrated
+
+    def import_file(self, path):
+        """Импортировать CSV- или JSON-экспорт браузера"""
+        if path.lower().endswith('.json'):
+            raw_records = iter_json_records(path)
+        else:
+            raw_records = iter_csv_records(path)
+
+        records = (normalize_record(record) for record in raw_records)
+        return self.import_records(record for record in records if record)
+
+    def export_backup(self, path, passphrase):
+        """Экспортировать хранилище в зашифрованный файл резервной копии"""
+        salt = os.urandom(BACKUP_SALT_SIZE)
+        backup_cipher = _derive_backup_cipher(passphrase, salt, BACKUP_ITERATIONS)
+
+        def seal_chunk(rows):
+            payload = json.dumps(self._decrypt_chunk(rows), ensure_ascii=False).encode()
+            return len(rows), backup_cipher.encrypt(payload)
+
+        exported = 0
+        with open(path, 'wb') as f:
+            f.write(BACKUP_MAGIC + salt + struct.pack('>I', BACKUP_ITERATIONS))
+            chunks = self.db_manager.iter_passwords(self.chunk_size)
+            for count, token in pipelined(seal_chunk, chunks, self.workers):
+                f.write(struct.pack('>I', len(token)))
+                f.write(token)
+                exported += count
+            f.write(struct.pack('>I', 0))
+        return exported
+
+    def _iter_backup_tokens(self, f):
+        """Прочитать кадры резервной копии"""
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                raise ValueError("Файл резервной копии поврежден.")
+            (size,) = struct.unpack('>I', header)
+            if size == 0:
+                return
+            token = f.read(size)
+            if len(token) < size:
+                raise ValueError("Файл резервной копии поврежден.")
+            yield token
+
+    def import_backup(self, path, passphrase):
+        """Восстановить записи из зашифрованной резервной копии"""
+        with open(path, 'rb') as f:
+            header = f.read(len(BACKUP_MAGIC) + BACKUP_SALT_SIZE + 4)
+            if not header.startswith(BACKUP_MAGIC):
+                raise ValueError("Файл не является резервной копией хранилища.")
+            salt = header[len(BACKUP_MAGIC):len(BACKUP_MAGIC) + BACKUP_SALT_SIZE]
+            (iterations,) = struct.unpack('>I', header[-4:])
+            backup_cipher = _derive_backup_cipher(passphrase, salt, iterations)
+
+            def open_chunk(token):
+                try:
+                    records = json.loads(backup_cipher.decrypt(token))
+                except InvalidToken:
+                    raise ValueError("Неверный пароль резервной копии.")
+                return self._encrypt_chunk(records)
+
+            imported = 0
+            for rows in pipelined(open_chunk, self._iter_backup_tokens(f), self.workers):
+                self.db_manager.add_passwords_bulk(rows)
+                imported += len(rows)
+            return imported
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""
+Поисковый индекс по метаданным хранилища паролей (название, логин, теги, URL)
+"""
+
+import hashlib
+import hmac
+import re
+import sqlite3
+
+SEARCH_FIELDS = ('name', 'login', 'tags', 'url')
+
+# Веса колонок для bm25: совпадение в названии важнее, чем в URL
+FIELD_WEIGHTS = {'name': 10.0, 'login': 4.0, 'tags': 6.0, 'url': 2.0, 'hashed': 4.0}
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(value):
+    """Разбить значение на нормализованные слова"""
+    return [token for token in TOKEN_PATTERN.findall((value or '').lower()) if token]
+
+
+def _trigrams(term):
+    """Триграммы слова для нечеткого поиска"""
+    if len(term) <= 3:
+        return [term]
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+def _quote(term):
+    """Экранировать строку для запроса FTS5"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+class VaultSearchIndex:
+    """Триграммный индекс FTS5 с ранжированием bm25
+
+    Поля из sensitive_fields не попадают в индекс открытым текстом: вместо них
+    сохраняются HMAC-отпечатки слов, поэтому по ним возможен только точный поиск по слову.
+    """
+
+    def __init__(self, db_manager, encryption_manager=None, sensitive_fields=()):
+        self.db_manager = db_manager
+        self.sensitive_fields = tuple(field for field in SEARCH_FIELDS if field in sensitive_fields)
+        self.plain_fields = tuple(field for field in SEARCH_FIELDS if field not in self.sensitive_fields)
+
+        self._hash_key = None
+        if self.sensitive_fields:
+            if encryption_manager is None:
+                raise ValueError("Для хэширования чувствительных полей нужен ключ шифрования.")
+            self._hash_key = hmac.new(encryption_manager.key, b'vault-search-index', hashlib.sha256).digest()
+
+        self.fts_available = True
+        self.init_index()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_manager.db_name)
+
+    def init_index(self):
+        """Создать индекс и триггеры, пересоздать индекс при смене набора чувствительных полей"""
+        layout = ','.join(self.plain_fields) + '|' + ','.join(self.sensitive_fields)
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS search_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS search_dirty (
+                    id INTEGER PRIMARY KEY
+                )
+            ''')
+            cursor.execute("SELECT value FROM search_meta WHERE key = 'layout'")
+            row = cursor.fetchone()
+            if row and row[0] != layout:
+                cursor.execute('DROP TABLE IF EXISTS passwords_search')
+                cursor.execute("DELETE FROM search_meta WHERE key = 'last_id'")
+
+            try:
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS passwords_search
+                    USING fts5({', '.join(SEARCH_FIELDS)}, hashed, tokenize='trigram')
+                ''')
+            except sqlite3.OperationalError:
+                # SQLite без FTS5 или без триграммного токенизатора (версии до 3.34)
+                self.fts_available = False
+                return
+
+            # Изменение записи убирает ее из индекса и помечает для refresh(), удаление - просто убирает.
+            # Смена шифртекста пароля индекс не затрагивает (триггер старых версий пересоздается)
+            cursor.execute('DROP TRIGGER IF EXISTS passwords_search_update')
+            cursor.execute(f'''
+                CREATE TRIGGER passwords_search_update AFTER UPDATE OF {', '.join(SEARCH_FIELDS)} ON passwords
+                BEGIN
+                    DELETE FROM passwords_search WHERE rowid = old.id;
+                    INSERT OR IGNORE INTO search_dirty (id) VALUES (new.id);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS passwords_search_delete AFTER DELETE ON passwords
+                BEGIN
+                    DELETE FROM passwords_search WHERE rowid = old.id;
+                END
+            ''')
+            cursor.execute("INSERT OR REPLACE INTO search_meta (key, value) VALUES ('layout', ?)", (layout,))
+            conn.commit()
+
+    def _fingerprint(self, token):
+        return hmac.new(self._hash_key, token.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _index_row(self, row):
+        """Значения колонок индекса для строки (id, name, login, tags, url)"""
+        values = dict(zip(SEARCH_FIELDS, row[1:]))
+        hashed = []
+        for field in self.sensitive_fields:
+            value = (values[field] or '').lower()
+            tokens = set(_tokens(value))
+            if value:
+                tokens.add(value)
+            hashed.extend(self._fingerprint(token) for token in sorted(tokens))
+            values[field] = ''
+        return (row[0],) + tuple(values[field] or '' for field in SEARCH_FIELDS) + (' '.join(hashed),)
+
+    def refresh(self, chunk_size=1000):
+        """Проиндексировать новые и измененные записи; вернуть их количество"""
+        if not self.fts_available:
+            return 0
+
+        columns = ', '.join(SEARCH_FIELDS)
+        indexed = 0
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM search_meta WHERE key = 'last_id'")
+            row = cursor.fetchone()
+            last_id = indexed_id = int(row[0]) if row else 0
+
+            # Новые записи идут по возрастанию id, поэтому достаточно помнить последний
+            # проиндексированный id; измененные старые записи отмечены триггером в search_dirty
+            while True:
+                cursor.execute(f'''
+                    SELECT id, {columns} FROM passwords WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                self._insert_rows(cursor, rows)
+                last_id = rows[-1][0]
+                indexed += len(rows)
+
+            cursor.execute(f'''
+                SELECT id, {columns} FROM passwords
+                WHERE id IN (SELECT id FROM search_dirty) AND id <= ?
+            ''', (indexed_id,))
+            rows = cursor.fetchall()
+            self._insert_rows(cursor, rows)
+            indexed += len(rows)
+
+            cursor.execute('DELETE FROM search_dirty')
+            cursor.execute("INSERT OR REPLACE INTO search_meta (key, value) VALUES ('last_id', ?)", (last_id,))
+            conn.commit()
+        return indexed
+
+    def _insert_rows(self, cursor, rows):
+        """Добавить строки (id, name, login, tags, url) в индекс"""
+        if rows:
+            cursor.executemany(f'''
+                INSERT INTO passwords_search (rowid, {', '.join(SEARCH_FIELDS)}, hashed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [self._index_row(row) for row in rows])
+
+    def rebuild(self):
+        """Полностью перестроить индекс"""
+        if not self.fts_available:
+            return 0
+        with self._connect() as conn:
+            conn.execute('DELETE FROM passwords_search')
+            conn.execute("DELETE FROM search_meta WHERE key = 'last_id'")
+            conn.commit()
+        return self.refresh()
+
+    def _exact_query(self, terms):
+        """Запрос FTS5: каждое слово встречается подстрокой (или совпадает отпечаток)"""
+        clauses = []
+        for term in terms:
+            options = []
+            if self.plain_fields and len(term) >= 3:
+                options.append('{' + ' '.join(self.plain_fields) + '} : ' + _quote(term))
+            if self.sensitive_fields:
+                options.append('hashed : ' + _quote(self._fingerprint(term)))
+            if not options:
+                return ''
+            clauses.append('(' + ' OR '.join(options) + ')')
+        return ' AND '.join(clauses)
+
+    def _fuzzy_query(self, terms):
+        """Запрос FTS5 по триграммам слов: чем больше общих триграмм, тем выше ранг"""
+        grams = sorted({gram for term in terms for gram in _trigrams(term) if len(gram) >= 3})
+        if not self.plain_fields or not grams:
+            return ''
+        return '{' + ' '.join(self.plain_fields) + '} : (' + ' OR '.join(_quote(gram) for gram in grams) + ')'
+
+    def _run_match(self, match, limit):
+        weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS + ('hashed',))
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT p.id, p.name, p.login, p.tags, p.url
+                FROM passwords_search s JOIN passwords p ON p.id = s.rowid
+                WHERE passwords_search MATCH ?
+                ORDER BY bm25(passwords_search, {weights})
+                LIMIT ?
+            ''', (match, limit))
+            return cursor.fetchall()
+
+    def search(self, query, limit=20):
+        """Найти записи по запросу; вернуть (id, name, login, tags, url) по убыванию релевантности"""
+        terms = _tokens(query)
+        if not terms:
+            return []
+
+        exact = self._exact_query(terms) if self.fts_available else ''
+        if not exact:
+            return self._search_like(terms, limit)
+
+        self.refresh()
+        results = self._run_match(exact, limit)
+
+        # Точных совпадений мало - добираем нечеткими (опечатки, пропущенные буквы)
+        fuzzy = self._fuzzy_query(terms) if len(results) < limit else ''
+        if fuzzy:
+            found = {row[0] for row in results}
+            for row in self._run_match(fuzzy, limit):
+                if row[0] not in found and len(results) < limit:
+                    results.append(row)
+        return results
+
+    def _search_like(self, terms, limit):
+        """Поиск подстрокой по открытым полям (короткие запросы или SQLite без FTS5)"""
+        if not self.plain_fields:
+            return []
+        conditions = []
+        params = []
+        for term in terms:
+            conditions.append('(' + ' OR '.join(f'lower({field}) LIKE ?' for field in self.plain_fields) + ')')
+            params.extend(f'%{term}%' for _ in self.plain_fields)
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, name, login, tags, url FROM passwords
+                WHERE {' AND '.join(conditions)}
+                ORDER BY name LIMIT ?
+            ''', params + [limit])
+            return cursor.fetchall()
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+"""
+Синхронизация копий хранилища паролей: векторы версий, дерево Меркла и обмен только изменениями
+
+Пароли передаются в зашифрованном виде как есть, поэтому у копий должен быть
+общий файл ключа .key.
+
+Скопированный файл passwords.db унаследует идентификатор копии (replica_id), и
+правки обеих копий могут получить одинаковые версии. Поэтому в листья дерева
+входит содержимое записи, а не только версия: разные записи с одной версией
+дают разные хэши и разрешаются как параллельные изменения. Копия, которая
+синхронизируется со своим оригиналом, вдобавок получает новый идентификатор.
+"""
+
+import base64
+import hashlib
+import json
+import sqlite3
+
+HEX_DIGITS = '0123456789abcdef'
+
+# Глубина дерева: листья - первые TREE_DEPTH символов uid (16**3 = 4096 листьев)
+TREE_DEPTH = 3
+
+EMPTY_HASH = hashlib.sha256(b'').hexdigest()
+
+ROW_FIELDS = ('uid', 'name', 'login', 'password', 'url', 'tags', 'version', 'deleted')
+
+
+def parse_version(version):
+    """Вектор версий из строки JSON"""
+    return json.loads(version) if version else {}
+
+
+def dump_version(vector):
+    return json.dumps(vector, sort_keys=True, separators=(',', ':'))
+
+
+def compare_versions(left, right):
+    """Сравнить векторы: 0 - равны, 1 - left новее, -1 - right новее, None - конфликт"""
+    left_newer = any(count > right.get(replica, 0) for replica, count in left.items())
+    right_newer = any(count > left.get(replica, 0) for replica, count in right.items())
+    if left_newer and right_newer:
+        return None
+    if left_newer:
+        return 1
+    if right_newer:
+        return -1
+    return 0
+
+
+def merge_versions(left, right):
+    return {replica: max(left.get(replica, 0), right.get(replica, 0)) for replica in set(left) | set(right)}
+
+
+def resolve_conflict(left, right):
+    """Выбрать победителя из двух параллельных изменений одной записи
+
+    Правило одинаково на обеих копиях: больше изменений (сумма вектора), затем
+    живая запись важнее удаления, затем сравнение содержимого. Победитель получает
+    объединенный вектор, который новее обоих.
+    """
+    def rank(row):
+        return (sum(parse_version(row['version']).values()), not row['deleted'],
+                json.dumps([row[field] for field in ROW_FIELDS if field != 'version'], ensure_ascii=False))
+
+    winner = dict(max(left, right, key=rank))
+    winner['version'] = dump_version(merge_versions(parse_version(left['version']), parse_version(right['version'])))
+    return winner
+
+
+def content_digest(name, login, password, url, tags):
+    """Отпечаток содержимого записи (пароль - шифртекст как есть); у удаленной записи пустой"""
+    if password is None:
+        return ''
+    if isinstance(password, str):
+        password = password.encode()
+    fields = json.dumps([name or '', login or '', url or '', tags or ''], ensure_ascii=False).encode()
+    return hashlib.sha256(fields + b'\0' + password).hexdigest()
+
+
+def _encode_password(value):
+    """Шифртекст в текстовом виде для передачи (двоичный формат или старый токен Fernet)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return 't:' + value
+    return 'b:' + base64.b64encode(value).decode()
+
+
+def _decode_password(value):
+    if value is None:
+        return None
+    if value.startswith('t:'):
+        return value[2:]
+    return base64.b64decode(value[2:])
+
+
+class VaultReplica:
+    """Копия хранилища: дерево Меркла по (uid, версия), выдача и применение записей"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._tree = None
+
+    def _connect(self):
+        return sqlite3.connect(self.db_manager.db_name)
+
+    def identity(self, _argument=None):
+        return self.db_manager.replica_id
+
+    def rekey(self):
+        """Новый идентификатор копии: дальнейшие правки будут отличаться от правок оригинала"""
+        return self.db_manager.reset_replica_id()
+
+    def tree(self, refresh=False):
+        """Хэши всех узлов дерева: префикс uid -> хэш (корень - пустой префикс)
+
+        Лист - хэш uid, версии и содержимого (поля и шифртекст) его записей.
+        """
+        if self._tree is not None and not refresh:
+            return self._tree
+
+        leaves = {}
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                SELECT uid, uid || ':' || version || ':' || COALESCE(name, '') || char(31) || COALESCE(login, '') ||
+                       char(31) || COALESCE(url, '') || char(31) || COALESCE(tags, '') || ':' ||
+                       hex(password_encrypted) || char(10)
+                FROM passwords
+                UNION ALL
+                SELECT uid, uid || ':' || version || char(10) FROM vault_tombstones
+                ORDER BY uid
+            ''')
+            digest, prefix = None, None
+            for uid, line in cursor:
+                if uid[:TREE_DEPTH] != prefix:
+                    if digest is not None:
+                        leaves[prefix] = digest.hexdigest()
+                    prefix, digest = uid[:TREE_DEPTH], hashlib.sha256()
+                digest.update(line.encode())
+            if digest is not None:
+                leaves[prefix] = digest.hexdigest()
+
+        tree = dict(leaves)
+        level = leaves
+        for depth in range(TREE_DEPTH - 1, -1, -1):
+            parents = {}
+            for prefix in {child[:depth] for child in level}:
+                children = (level.get(prefix + digit, EMPTY_HASH) for digit in HEX_DIGITS)
+                parents[prefix] = hashlib.sha256(''.join(children).encode()).hexdigest()
+            tree.update(parents)
+            level = parents
+        self._tree = tree
+        return tree
+
+    def hashes(self, prefixes):
+        """Хэши узлов с данными префиксами; запрос корня начинает новый сеанс и пересчитывает дерево"""
+        tree = self.tree(refresh='' in prefixes)
+        return {prefix: tree.get(prefix, EMPTY_HASH) for prefix in prefixes}
+
+    def versions(self, prefixes):
+        """Версии записей в листьях: uid -> версия (включая удаленные)"""
+        result = {}
+        with self._connect() as conn:
+            for prefix in prefixes:
+                bounds = (prefix, prefix + 'g')
+                for table in ('passwords', 'vault_tombstones'):
+                    result.update(conn.execute(f'SELECT uid, version FROM {table} WHERE uid >= ? AND uid < ?', bounds))
+        return result
+
+    def digests(self, uids):
+        """Отпечатки содержимого записей: uid -> sha256 (пустой у удаленных)"""
+        result = {}
+        with self._connect() as conn:
+            for uid in uids:
+                row = conn.execute('SELECT name, login, password_encrypted, url, tags FROM passwords WHERE uid = ?',
+                                   (uid,)).fetchone()
+                result[uid] = content_digest(*row) if row else ''
+        return result
+
+    def fetch(self, uids):
+        """Записи целиком (с зашифрованным паролем) для передачи другой копии"""
+        rows = []
+        with self._connect() as conn:
+            for uid in uids:
+                row = conn.execute('SELECT uid, name, login, password_encrypted, url, tags, version FROM passwords '
+                                   'WHERE uid = ?', (uid,)).fetchone()
+                if row:
+                    rows.append(dict(zip(ROW_FIELDS, row[:3] + (_encode_password(row[3]),) + row[4:] + (False,))))
+                    continue
+                row = conn.execute('SELECT uid, version FROM vault_tombstones WHERE uid = ?', (uid,)).fetchone()
+                if row:
+                    rows.append({'uid': row[0], 'name': None, 'login': None, 'password': None,
+                                 'url': None, 'tags': None, 'version': row[1], 'deleted': True})
+        return rows
+
+    def apply(self, rows):
+        """Применить записи другой копии, если они не старее местных; вернуть число примененных"""
+        applied = 0
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for row in rows:
+                current = self._current_version(cursor, row['uid'])
+                if current is not None and compare_versions(parse_version(row['version']), parse_version(current)) == -1:
+                    continue  # У нас уже более новая версия
+
+                if row['deleted']:
+                    cursor.execute('DELETE FROM password_history WHERE entry_id IN (SELECT id FROM passwords WHERE uid = ?)',
+                                   (row['uid'],))
+                    cursor.execute('DELETE FROM passwords WHERE uid = ?', (row['uid'],))
+                    cursor.execute('INSERT OR REPLACE INTO vault_tombstones (uid, version) VALUES (?, ?)',
+                                   (row['uid'], row['version']))
+                else:
+                    values = (row['name'], row['login'], _decode_password(row['password']),
+                              row['url'] or '', row['tags'] or '', row['version'], row['uid'])
+                    # Пароль, замененный другой копией, остается в местной истории
+                    previous = cursor.execute('SELECT id, password_encrypted FROM passwords WHERE uid = ?',
+                                              (row['uid'],)).fetchone()
+                    if previous and previous[1] != values[2]:
+                        self.db_manager.record_history(cursor, *previous)
+                    cursor.execute('''
+                        UPDATE passwords SET name = ?, login = ?, password_encrypted = ?, url = ?, tags = ?, version = ?
+                        WHERE uid = ?
+                    ''', values)
+                    if cursor.rowcount == 0:
+                        cursor.execute('''
+                            INSERT INTO passwords (name, login, password_encrypted, url, tags, version, uid)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ''', values)
+                    cursor.execute('DELETE FROM vault_tombstones WHERE uid = ?', (row['uid'],))
+                applied += 1
+            conn.commit()
+        self._tree = None
+        return applied
+
+    @staticmethod
+    def _current_version(cursor, uid):
+        """Текущая версия записи (живой или удаленной) или None"""
+        for table in ('passwords', 'vault_tombstones'):
+            row = cursor.execute(f'SELECT version FROM {table} WHERE uid = ?', (uid,)).fetchone()
+            if row:
+                return row[0]
+        return None
+
+
+class SyncReport:
+    """Итоги синхронизации"""
+
+    def __init__(self):
+        self.hashes_exchanged = 0
+        self.differing_leaves = 0
+        self.pulled = 0
+        self.pushed = 0
+        self.conflicts = 0
+        self.rekeyed = False
+        self.requests = 0
+        self.bytes_transferred = 0
+
+
+class VaultSync:
+    """Двусторонняя синхронизация местной копии с удаленной через транспорт"""
+
+    def __init__(self, local, transport):
+        self.local = local
+        self.transport = transport
+
+    def _differing_leaves(self, report):
+        """Спуск по дереву: запрашиваются только хэши детей несовпавших узлов"""
+        local_tree = self.local.tree(refresh=True)
+        prefixes = ['']
+        for depth in range(TREE_DEPTH + 1):
+            remote = self.transport.call('hashes', prefixes)
+            report.hashes_exchanged += len(remote)
+            differing = [prefix for prefix in prefixes if local_tree.get(prefix, EMPTY_HASH) != remote[prefix]]
+            if depth == TREE_DEPTH or not differing:
+                return differing
+            prefixes = [prefix + digit for prefix in differing for digit in HEX_DIGITS]
+        return []
+
+    def sync(self):
+        """Выполнить синхронизацию; вернуть SyncReport"""
+        report = SyncReport()
+        start_requests, start_bytes = self.transport.requests, self.transport.bytes_sent + self.transport.bytes_received
+
+        # Копия того же файла: дальнейшие правки должны отличаться от правок оригинала
+        report.rekeyed = self.transport.call('identity', None) == self.local.identity()
+        if report.rekeyed:
+            self.local.rekey()
+
+        leaves = self._differing_leaves(report)
+        report.differing_leaves = len(leaves)
+        if leaves:
+            local_versions = self.local.versions(leaves)
+            remote_versions = self.transport.call('versions', leaves)
+
+            pull, push, conflicts, same = [], [], [], []
+            for uid in sorted(set(local_versions) | set(remote_versions)):
+                if uid not in remote_versions:
+                    push.append(uid)
+                    continue
+                if uid not in local_versions:
+                    pull.append(uid)
+                    continue
+                order = compare_versions(parse_version(local_versions[uid]), parse_version(remote_versions[uid]))
+                if order == 1:
+                    push.append(uid)
+                elif order == -1:
+                    pull.append(uid)
+                elif order is None:
+                    conflicts.append(uid)
+                else:
+                    same.append(uid)
+
+            # Одинаковая версия, но разное содержимое: правки копий файла с общим replica_id
+            if same:
+                local_digests = self.local.digests(same)
+                remote_digests = self.transport.call('digests', same)
+                conflicts.extend(uid for uid in same if local_digests[uid] != remote_digests[uid])
+
+            remote_rows = self.transport.call('fetch', pull + conflicts) if pull or conflicts else []
+            remote_by_uid = {row['uid']: row for row in remote_rows}
+            incoming = [remote_by_uid[uid] for uid in pull if uid in remote_by_uid]
+
+            local_by_uid = {row['uid']: row for row in self.local.fetch(push + conflicts)}
+            outgoing = [local_by_uid[uid] for uid in push if uid in local_by_uid]
+            for uid in conflicts:
+                if uid in local_by_uid and uid in remote_by_uid:
+                    merged = resolve_conflict(local_by_uid[uid], remote_by_uid[uid])
+                    incoming.append(merged)
+                    outgoing.append(merged)
+
+            report.pulled = self.local.apply(incoming) if incoming else 0
+            report.pushed = self.transport.call('apply', outgoing) if outgoing else 0
+            report.conflicts = len(conflicts)
+
+        report.requests = self.transport.requests - start_requests
+        report.bytes_transferred = self.transport.bytes_sent + self.transport.bytes_received - start_bytes
+        return report